@@ -146,6 +146,20 @@ def format(ctx: Context) -> None:
     ctx.run(tools.ruff.format(*PY_SRC_LIST, config="config/ruff.toml"), title="Formatting code")
 
 
+@duty
+def bench(ctx: Context, *cli_args: str) -> None:
+    """Benchmark the rendering pipeline, and compare results with the previous run.
+
+    Results are appended to `.benchmarks/history.jsonl`.
+    Pass `--no-save` to skip that, or stage names and `--sizes` to select benchmarks.
+    """
+    ctx.run(
+        [sys.executable, "scripts/benchmark.py", *cli_args],
+        title="Running benchmarks",
+        capture=False,
+    )
+
+
 @duty
 def build(ctx: Context) -> None:
     """Build source and wheel distributions."""
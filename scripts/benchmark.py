@@ -0,0 +1,171 @@
+# Benchmark the rendering pipeline on synthetic inputs of increasing size.
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from xml.etree.ElementTree import Element, SubElement
+
+from markdown import Markdown
+from markupsafe import Markup
+
+from markdown_exec import formatter, formatters, validator
+from markdown_exec._internal.formatters.tree import _format_tree
+from markdown_exec._internal.processors import InsertHeadings, RemoveHeadings, _IdsAndHeadingsTreeprocessor
+from markdown_exec._internal.rendering import MarkdownConverter
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+_root = Path(__file__).parent.parent
+_history = _root / ".benchmarks" / "history.jsonl"
+
+
+def _markdown() -> Markdown:
+    fences = [
+        {"name": language, "class": language, "validator": validator, "format": formatter} for language in formatters
+    ]
+    return Markdown(
+        extensions=["pymdownx.superfences", "toc"],
+        extension_configs={"pymdownx.superfences": {"custom_fences": fences}},
+    )
+
+
+def _bench_convert(size: int) -> Callable[[], Any]:
+    text = "\n\n".join(f"## Section {index}\n\nSome *text* with a [link](#section-{index})." for index in range(size))
+    converter = MarkdownConverter(_markdown())
+    return lambda: converter.convert(text)
+
+
+def _bench_ids(size: int) -> Callable[[], Any]:
+    root = Element("div")
+    for index in range(size):
+        heading = SubElement(root, "h2", {"id": f"section-{index}"})
+        SubElement(heading, "a", {"href": f"#section-{index}", "name": f"anchor-{index}"})
+        SubElement(root, "label", {"for": f"input-{index}"})
+    processor = _IdsAndHeadingsTreeprocessor(_markdown(), "exec-1--", [])
+    # Copy the tree in the benchmarked function, since the processor mutates it.
+    return lambda: processor.run(copy.deepcopy(root))
+
+
+def _bench_headings(size: int) -> Callable[[], Any]:
+    md = _markdown()
+    root = Element("div")
+    headings = {}
+    for index in range(size):
+        markup = Markup(f"<h2>Heading {index}</h2>")  # noqa: S704
+        placeholder = md.htmlStash.store(markup)
+        SubElement(root, "p").text = placeholder
+        headings[markup] = [Element("h2", {"id": f"heading-{index}"})]
+    insert = InsertHeadings(md)
+    insert.headings = headings
+    md.treeprocessors.register(insert, InsertHeadings.name, priority=75)
+    remove = RemoveHeadings(md)
+
+    def run() -> None:
+        tree = copy.deepcopy(root)
+        insert.run(tree)
+        remove.run(tree)
+
+    return run
+
+
+def _bench_tree(size: int) -> Callable[[], Any]:
+    # Nested folders, four levels deep, each last one containing a file.
+    code = "\n".join(
+        f"{'    ' * (index % 5)}folder{index}/" if index % 5 < 4 else f"{'    ' * 4}file{index}.py"  # noqa: PLR2004
+        for index in range(size)
+    )
+    md = _markdown()
+    return lambda: _format_tree(code, md, "", {})
+
+
+def _bench_validator(size: int) -> Callable[[], Any]:
+    inputs = {"exec": "1", "source": "above", "session": "bench", "width": "80", "title": "bench.py"}
+
+    def run() -> None:
+        for _ in range(size):
+            validator("python", dict(inputs), {}, {}, None)  # ty:ignore[invalid-argument-type]
+
+    return run
+
+
+_benchmarks: dict[str, Callable[[int], Callable[[], Any]]] = {
+    "convert": _bench_convert,
+    "ids": _bench_ids,
+    "headings": _bench_headings,
+    "tree": _bench_tree,
+    "validator": _bench_validator,
+}
+
+
+def _measure(func: Callable[[], Any], repeat: int) -> float:
+    # Best of several runs, less sensitive to noise than the mean.
+    func()  # Warm up (imports, caches).
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=_root, text=True).strip()  # noqa: S607
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _previous_results() -> dict[str, float]:
+    if not _history.exists():
+        return {}
+    lines = _history.read_text(encoding="utf8").splitlines()
+    return json.loads(lines[-1])["results"] if lines else {}
+
+
+def main(args: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the rendering pipeline.")
+    stages_help = f"Stages to benchmark, among {', '.join(_benchmarks)} (default: all)."
+    parser.add_argument("stages", nargs="*", help=stages_help)
+    parser.add_argument("-s", "--sizes", default="10,100,1000", help="Comma-separated input sizes.")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of runs per benchmark.")
+    parser.add_argument("--no-save", action="store_true", help="Do not append results to the history.")
+    opts = parser.parse_args(args)
+    if unknown := set(opts.stages) - set(_benchmarks):
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    previous = _previous_results()
+    results = {}
+    sizes = [int(size) for size in opts.sizes.split(",")]
+    print(f"{'benchmark':<20} {'time (ms)':>12} {'per item (µs)':>14} {'vs previous':>12}")
+    for stage in opts.stages or _benchmarks:
+        for size in sizes:
+            name = f"{stage}:{size}"
+            results[name] = elapsed = _measure(_benchmarks[stage](size), opts.repeat)
+            ratio = f"{elapsed / previous[name]:.2f}x" if previous.get(name) else "-"
+            print(f"{name:<20} {elapsed * 1000:>12.3f} {elapsed / size * 1e6:>14.2f} {ratio:>12}")
+
+    if not opts.no_save:
+        _history.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        with _history.open("a", encoding="utf8") as file:
+            file.write(json.dumps(entry) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
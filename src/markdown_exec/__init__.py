@@ -3,29 +3,38 @@
 Utilities to execute code blocks in Markdown files.
 """
 
-from markdown_exec._internal.formatters.base import (
-    ExecutionError,
-    base_format,
-    console_width,
-    default_tabs,
-    working_directory,
-)
-from markdown_exec._internal.logger import get_logger, patch_loggers
-from markdown_exec._internal.main import MARKDOWN_EXEC_AUTO, formatter, formatters, validator
-from markdown_exec._internal.processors import (
-    HeadingReportingTreeprocessor,
-    IdPrependingTreeprocessor,
-    InsertHeadings,
-    RemoveHeadings,
-)
-from markdown_exec._internal.rendering import (
-    MarkdownConfig,
-    MarkdownConverter,
-    add_source,
-    code_block,
-    markdown_config,
-    tabbed,
-)
+from __future__ import annotations
+
+from importlib import import_module
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from markdown_exec._internal.formatters.base import (
+        ExecutionError,
+        base_format,
+        console_width,
+        default_tabs,
+        working_directory,
+    )
+    from markdown_exec._internal.formatters.python import purge_python_state, python_state
+    from markdown_exec._internal.logger import get_logger, patch_loggers
+    from markdown_exec._internal.main import MARKDOWN_EXEC_AUTO, async_formatter, formatter, formatters, validator
+    from markdown_exec._internal.mkdocs_plugin import MarkdownExecPlugin, MarkdownExecPluginConfig
+    from markdown_exec._internal.processors import (
+        HeadingReportingTreeprocessor,
+        IdPrependingTreeprocessor,
+        InsertHeadings,
+        RemoveHeadings,
+    )
+    from markdown_exec._internal.rendering import (
+        MarkdownConfig,
+        MarkdownConverter,
+        add_source,
+        code_block,
+        markdown_config,
+        tabbed,
+    )
 
 __all__ = [
     "MARKDOWN_EXEC_AUTO",
@@ -37,6 +46,7 @@ __all__ = [
     "MarkdownConverter",
     "RemoveHeadings",
     "add_source",
+    "async_formatter",
     "base_format",
     "code_block",
     "console_width",
@@ -46,18 +56,59 @@ __all__ = [
     "get_logger",
     "markdown_config",
     "patch_loggers",
+    "purge_python_state",
+    "python_state",
     "tabbed",
     "validator",
     "working_directory",
 ]
 
 
-try:
-    from markdown_exec._internal.mkdocs_plugin import MarkdownExecPlugin, MarkdownExecPluginConfig
-except ImportError:
-    pass
-else:
+if find_spec("mkdocs") is not None:
     __all__ += [
         "MarkdownExecPlugin",
         "MarkdownExecPluginConfig",
     ]
+
+# Objects are imported on first access, so that using the formatters with Python-Markdown
+# does not import the MkDocs plugin (and MkDocs itself), nor every formatter up-front.
+_lazy_objects = {
+    "ExecutionError": "markdown_exec._internal.formatters.base",
+    "base_format": "markdown_exec._internal.formatters.base",
+    "console_width": "markdown_exec._internal.formatters.base",
+    "default_tabs": "markdown_exec._internal.formatters.base",
+    "working_directory": "markdown_exec._internal.formatters.base",
+    "purge_python_state": "markdown_exec._internal.formatters.python",
+    "python_state": "markdown_exec._internal.formatters.python",
+    "get_logger": "markdown_exec._internal.logger",
+    "patch_loggers": "markdown_exec._internal.logger",
+    "MARKDOWN_EXEC_AUTO": "markdown_exec._internal.main",
+    "async_formatter": "markdown_exec._internal.main",
+    "formatter": "markdown_exec._internal.main",
+    "formatters": "markdown_exec._internal.main",
+    "validator": "markdown_exec._internal.main",
+    "HeadingReportingTreeprocessor": "markdown_exec._internal.processors",
+    "IdPrependingTreeprocessor": "markdown_exec._internal.processors",
+    "InsertHeadings": "markdown_exec._internal.processors",
+    "RemoveHeadings": "markdown_exec._internal.processors",
+    "MarkdownConfig": "markdown_exec._internal.rendering",
+    "MarkdownConverter": "markdown_exec._internal.rendering",
+    "add_source": "markdown_exec._internal.rendering",
+    "code_block": "markdown_exec._internal.rendering",
+    "markdown_config": "markdown_exec._internal.rendering",
+    "tabbed": "markdown_exec._internal.rendering",
+    "MarkdownExecPlugin": "markdown_exec._internal.mkdocs_plugin",
+    "MarkdownExecPluginConfig": "markdown_exec._internal.mkdocs_plugin",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _lazy_objects and name in __all__:
+        value = getattr(import_module(_lazy_objects[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted(__all__)
@@ -0,0 +1,323 @@
+# Cache for the output of executed code blocks.
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import platform
+import sys
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cache, partial
+from importlib import metadata
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from markdown_exec._internal.logger import get_logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+_logger = get_logger(__name__)
+
+
+@cache
+def _environment_fingerprint() -> str:
+    # Outputs depend on the interpreter and the installed packages,
+    # so we invalidate every entry as soon as one of them changes.
+    packages = sorted(f"{dist.metadata['Name']}=={dist.version}" for dist in metadata.distributions())
+    data = {
+        "python": sys.version,
+        "executable": sys.executable,
+        "platform": platform.platform(),
+        "packages": packages,
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def _hash(data: dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _runner_name(run: Callable) -> str:
+    return f"{getattr(run, '__module__', '')}.{getattr(run, '__qualname__', '')}"
+
+
+def _execution_data(
+    run: Callable,
+    language: str,
+    code: str,
+    *,
+    returncode: int = 0,
+    id: str = "",  # noqa: A002
+    workdir: str | None = None,
+    width: int | None = None,
+    extra: dict[str, Any] | None = None,
+    **options: Any,  # noqa: ARG001
+) -> dict[str, Any]:
+    # Everything that can change the output of a code block.
+    return {
+        "runner": _runner_name(run),
+        "language": language,
+        "code": code,
+        "returncode": returncode,
+        "id": id,
+        "workdir": workdir,
+        "width": width,
+        "extra": extra or {},
+        # The output of Python code blocks is truncated according to these settings.
+        "output_limit": os.getenv("MARKDOWN_EXEC_OUTPUT_LIMIT"),
+        "output_truncate": os.getenv("MARKDOWN_EXEC_OUTPUT_TRUNCATE"),
+    }
+
+
+# Output prefetched for the code block being rendered in the current context, with the hash of its data.
+_current_prefetched: ContextVar[tuple[str, Callable[[Callable[[], str]], str]] | None] = ContextVar(
+    "_current_prefetched",
+    default=None,
+)
+
+
+class _ExecutionCache:
+    def __init__(self, directory: str | Path | None = None) -> None:
+        # Cache directory, the cache is disabled when not set.
+        self.directory: Path | None = Path(directory) if directory else None
+        # Last key of each session, so that keys chain through the blocks of a session.
+        self._chains: dict[str, str] = {}
+        # Keys of session blocks served from the cache, and their run functions,
+        # to replay before the next executed block of the same session.
+        self._pending: dict[str, list[tuple[str, Callable[[], Any]]]] = defaultdict(list)
+        # Resolvers for the output of session-less blocks executed ahead of rendering.
+        self._prefetched: dict[str, Callable[[Callable[[], str]], str]] = {}
+        # Outputs kept in memory across builds of a same process (when serving docs), by key.
+        self._memory: dict[str, str] | None = None
+        # Keys used during the current build, to forget outdated outputs at the end of the build.
+        self._used: set[str] = set()
+        # Page being rendered, and number of code blocks executed (not served from the cache) per page.
+        self.page: str | None = None
+        self.executed: dict[str | None, int] = defaultdict(int)
+        # How the output of the last code block was obtained.
+        self.status = ""
+        # Whether to checkpoint the state of sessions after each block, and the checkpoints by key.
+        self.checkpoints = False
+        self._checkpoints: dict[str, bytes] = {}
+        # Functions to snapshot and restore the state of a session, by runner.
+        self._checkpointers: dict[str, tuple[Callable[[str], bytes | None], Callable[[str, bytes], None]]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None or self._memory is not None
+
+    def configure(self, directory: str | Path | None) -> None:
+        self.directory = Path(directory) if directory else None
+
+    def keep_in_memory(self, enabled: bool) -> None:  # noqa: FBT001
+        if not enabled:
+            self._memory = None
+        elif self._memory is None:
+            self._memory = {}
+
+    def reset(self) -> None:
+        self._chains.clear()
+        self._pending.clear()
+        for key in self._prefetched:
+            _logger.debug("Prefetched output of code block %s was not used", key)
+        self._prefetched.clear()
+        if self._memory is not None:
+            self._memory = {key: output for key, output in self._memory.items() if key in self._used}
+        self._checkpoints = {key: state for key, state in self._checkpoints.items() if key in self._used}
+        self._used.clear()
+        self.page = None
+        self.executed.clear()
+
+    def reset_sessions(self) -> None:
+        # Sessions were released, the next blocks of a session start a new chain.
+        self._chains.clear()
+        self._pending.clear()
+
+    def register_checkpointer(
+        self,
+        run: Callable,
+        snapshot: Callable[[str], bytes | None],
+        restore: Callable[[str, bytes], None],
+    ) -> None:
+        self._checkpointers[_runner_name(run)] = (snapshot, restore)
+
+    def prefetch(self, data: dict[str, Any], resolve: Callable[[Callable[[], str]], str]) -> None:
+        self._prefetched[_hash(data)] = resolve
+
+    @contextmanager
+    def prefetched(self, data: dict[str, Any], resolve: Callable[[Callable[[], str]], str]) -> Iterator[None]:
+        # Hand an output computed ahead of time to the code block rendered in this context only,
+        # so that blocks rendered concurrently never use each other's output.
+        token = _current_prefetched.set((_hash(data), resolve))
+        try:
+            yield
+        finally:
+            if _current_prefetched.get() is not None:
+                _logger.debug("Prefetched output of code block %s was not used", _hash(data))
+            _current_prefetched.reset(token)
+
+    def contains(self, data: dict[str, Any]) -> bool:
+        if not self.enabled:
+            return False
+        key = _hash({**data, "environment": _environment_fingerprint()})
+        if self._memory is not None and key in self._memory:
+            return True
+        return self.directory is not None and self._path(key).exists()
+
+    def execute(
+        self,
+        run: Callable[[], str],
+        *,
+        data: dict[str, Any],
+        session: str | None = None,
+        use_cache: bool = True,
+    ) -> str:
+        executed = "executed"
+        # Prefetched outputs are used once: identical blocks of a page are not assumed to output the same thing,
+        # unless the cache says so.
+        resolve = None
+        if not session:
+            current = _current_prefetched.get()
+            if current is not None and current[0] == _hash(data):
+                resolve = current[1]
+                _current_prefetched.set(None)
+            elif self._prefetched:
+                resolve = self._prefetched.pop(_hash(data), None)
+        if resolve is not None:
+            run = partial(resolve, run)
+            executed = "parallel"
+
+        if not self.enabled:
+            self.status = executed
+            return run()
+
+        key_data = {**data, "environment": _environment_fingerprint()}
+        if session:
+            session_key = f"{data['runner']}:{session}"
+            key_data["previous"] = self._chains.get(session_key, "")
+        key = _hash(key_data)
+        if session:
+            self._chains[session_key] = key
+        self._used.add(key)
+
+        if use_cache:
+            output = self._load(key)
+            if output is not None:
+                _logger.debug("Using cached output for code block %s", key)
+                if resolve is not None:
+                    _logger.debug("Prefetched output of code block %s not used, it was cached meanwhile", key)
+                self.status = "cached"
+                if session:
+                    self._pending[session_key].append((key, run))
+                return output
+
+        if session:
+            self._replay(data["runner"], session, session_key)
+        self.executed[self.page] += 1
+        self.status = executed
+        output = run()
+        if use_cache:
+            self._store(key, output)
+        if session:
+            self._checkpoint(data["runner"], session, key)
+        return output
+
+    def _replay(self, runner: str, session: str, session_key: str) -> None:
+        # Previous blocks of the session were served from the cache,
+        # so we rebuild the state this block depends on, restoring the last
+        # available checkpoint and running the blocks that follow it.
+        pending = self._pending.pop(session_key, [])
+        start = self._restore(runner, session, [key for key, _ in pending])
+        for key, run in pending[start:]:
+            try:
+                run()
+            except Exception as error:  # noqa: BLE001,PERF203
+                _logger.debug("Replaying cached code block failed: %s", error)
+            else:
+                self._checkpoint(runner, session, key)
+
+    def _checkpoint(self, runner: str, session: str, key: str) -> None:
+        if not self.checkpoints or runner not in self._checkpointers or self._has_checkpoint(key):
+            return
+        snapshot, _ = self._checkpointers[runner]
+        try:
+            state = snapshot(session)
+        except Exception as error:  # noqa: BLE001
+            _logger.debug("Could not checkpoint session '%s': %s", session, error)
+            return
+        if state is None:
+            return
+        self._checkpoints[key] = state
+        if self.directory is not None:
+            self._write(self._checkpoint_path(key), state)
+
+    def _restore(self, runner: str, session: str, keys: list[str]) -> int:
+        # Return the index of the first block to replay after restoring a checkpoint.
+        if not self.checkpoints or runner not in self._checkpointers:
+            return 0
+        _, restore = self._checkpointers[runner]
+        for index in range(len(keys) - 1, -1, -1):
+            state = self._load_checkpoint(keys[index])
+            if state is None:
+                continue
+            try:
+                restore(session, state)
+            except Exception as error:  # noqa: BLE001
+                _logger.debug("Could not restore checkpoint of session '%s': %s", session, error)
+                continue
+            _logger.debug("Restored session '%s' from checkpoint %s", session, keys[index])
+            return index + 1
+        return 0
+
+    def _checkpoint_path(self, key: str) -> Path:
+        return self.directory / f"{key}.checkpoint"  # ty:ignore[unsupported-operator]
+
+    def _has_checkpoint(self, key: str) -> bool:
+        return key in self._checkpoints or (self.directory is not None and self._checkpoint_path(key).exists())
+
+    def _load_checkpoint(self, key: str) -> bytes | None:
+        if key in self._checkpoints:
+            return self._checkpoints[key]
+        if self.directory is None:
+            return None
+        try:
+            state = self._checkpoint_path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        self._checkpoints[key] = state
+        return state
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.out"  # ty:ignore[unsupported-operator]
+
+    def _load(self, key: str) -> str | None:
+        if self._memory is not None and key in self._memory:
+            return self._memory[key]
+        if self.directory is None:
+            return None
+        try:
+            output = self._path(key).read_text(encoding="utf8")
+        except FileNotFoundError:
+            return None
+        if self._memory is not None:
+            self._memory[key] = output
+        return output
+
+    def _store(self, key: str, output: str) -> None:
+        if self._memory is not None:
+            self._memory[key] = output
+        if self.directory is not None:
+            self._write(self._path(key), output.encode("utf8"))
+
+    def _write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(path)
+
+
+_execution_cache = _ExecutionCache(os.getenv("MARKDOWN_EXEC_CACHE"))
@@ -0,0 +1,64 @@
+# Bounded buffer capturing the output of executed Python code.
+
+from __future__ import annotations
+
+import os
+from tempfile import SpooledTemporaryFile
+
+# Output is kept in memory up to this size (in bytes), then written to a temporary file.
+_spill_size = 1024 * 1024
+
+
+class _OutputBuffer:
+    def __init__(self, limit: int | None = None, truncate: str = "head") -> None:
+        # Maximum size of the output in bytes, and which part to keep ("head" or "tail") when it is exceeded.
+        self.limit = limit
+        self.truncate = truncate
+        self._file = SpooledTemporaryFile(max_size=_spill_size)  # noqa: SIM115
+        self._size = 0
+        self._dropped = 0
+
+    @classmethod
+    def from_environment(cls) -> _OutputBuffer:
+        limit = os.getenv("MARKDOWN_EXEC_OUTPUT_LIMIT")
+        return cls(int(limit) if limit else None, os.getenv("MARKDOWN_EXEC_OUTPUT_TRUNCATE", "head"))
+
+    def write(self, text: str) -> None:
+        data = text.encode("utf8")
+        if self.limit is not None and self.truncate == "head":
+            room = self.limit - self._size
+            if len(data) > room:
+                self._dropped += len(data) - max(room, 0)
+                if room <= 0:
+                    return
+                data = data[:room]
+        self._file.write(data)
+        self._size += len(data)
+        # Only keep twice the limit, so that we don't have to drop bytes on each write.
+        if self.limit is not None and self.truncate == "tail" and self._size > 2 * self.limit:
+            self._keep_tail()
+
+    def _keep_tail(self) -> None:
+        self._file.seek(self._size - self.limit)  # ty:ignore[unsupported-operator]
+        tail = self._file.read()
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(tail)
+        self._dropped += self._size - len(tail)
+        self._size = len(tail)
+
+    def getvalue(self) -> str:
+        if self.limit is not None and self.truncate == "tail" and self._size > self.limit:
+            self._keep_tail()
+        self._file.seek(0)
+        # Truncating may have split a multi-byte character.
+        output = self._file.read().decode("utf8", errors="ignore")
+        if not self._dropped:
+            return output
+        marker = f"[... {self._dropped} bytes of output truncated ...]"
+        if self.truncate == "tail":
+            return f"{marker}\n{output}"
+        return f"{output}\n{marker}\n"
+
+    def close(self) -> None:
+        self._file.close()
@@ -0,0 +1,215 @@
+# Worker processes executing Python code blocks outside of the main process.
+
+from __future__ import annotations
+
+import atexit
+import importlib
+import multiprocessing
+import os
+from contextlib import contextmanager, suppress
+from itertools import cycle
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from markdown_exec._internal.formatters.base import ExecutionError, working_directory
+from markdown_exec._internal.logger import get_logger
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from multiprocessing.connection import Connection
+    from multiprocessing.process import BaseProcess
+
+_logger = get_logger(__name__)
+
+
+def _worker_main(connection: Connection, preload: list[str]) -> None:
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except ImportError as error:  # noqa: PERF203
+            _logger.warning("Could not preload module '%s' in Python worker: %s", module, error)
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        func, args, kwargs = message
+        try:
+            result = (True, func(*args, **kwargs))
+        except Exception as error:  # noqa: BLE001
+            result = (False, error)
+        try:
+            connection.send(result)
+        except Exception as error:  # noqa: BLE001
+            # Unpicklable result or exception.
+            connection.send((False, RuntimeError(str(error))))
+    connection.close()
+
+
+def _forwarded_environment() -> dict[str, str]:
+    # Console width and variables configuring the execution, that may have changed since workers started.
+    return {name: value for name, value in os.environ.items() if name == "COLUMNS" or name.startswith("MARKDOWN_EXEC_")}
+
+
+@contextmanager
+def _environment(variables: dict[str, str]) -> Iterator[None]:
+    previous = {name: os.environ.get(name) for name in variables}
+    os.environ.update(variables)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _call_in_context(
+    cwd: str,
+    variables: dict[str, str],
+    func: Callable,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+) -> Any:
+    # Apply the working directory and environment the main process is using for the block.
+    with working_directory(cwd), _environment(variables):
+        return func(*args, **kwargs)
+
+
+class _WorkerDiedError(Exception):
+    # The worker process exited (crash, OOM kill, `os._exit`) or its pipe broke.
+    pass
+
+
+class _Worker:
+    def __init__(self, context: Any, preload: list[str]) -> None:
+        self.connection, child_connection = context.Pipe()
+        self.process: BaseProcess = context.Process(
+            target=_worker_main,
+            args=(child_connection, preload),
+            daemon=True,
+        )
+        self.process.start()
+        child_connection.close()
+
+    def call(self, func: Callable, args: tuple[Any, ...], kwargs: dict[str, Any], timeout: float | None = None) -> Any:
+        try:
+            self.connection.send((func, args, kwargs))
+            answered = timeout is None or self.connection.poll(timeout)
+            if answered:
+                success, result = self.connection.recv()
+        except (EOFError, OSError) as error:
+            raise _WorkerDiedError(str(error)) from error
+        if not answered:
+            raise TimeoutError(f"Python worker did not answer within {timeout:g} seconds")
+        if success:
+            return result
+        raise result
+
+    def stop(self) -> None:
+        with suppress(OSError):
+            self.connection.send(None)
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class _PythonWorkers:
+    def __init__(self) -> None:
+        self.size = 0
+        self.preload: list[str] = []
+        self._context: Any = None
+        self._workers: list[_Worker] = []
+        self._next_worker: Iterator[int] = iter(())
+        self._affinity: dict[str, int] = {}
+        self._owner: int | None = None
+
+    @property
+    def enabled(self) -> bool:
+        # Processes forked from ours (parallel execution for example) execute code themselves,
+        # instead of starting their own workers.
+        return self.size > 0 and self._owner == os.getpid()
+
+    def configure(self, size: int, preload: list[str] | None = None) -> None:
+        self.stop()
+        self.size = size
+        self.preload = list(preload or ())
+        # Workers belong to the process that configured them.
+        self._owner = os.getpid()
+
+    def start(self) -> None:
+        if os.name == "posix":
+            # Workers are forked from a server process that already imported the preloaded modules.
+            self._context = multiprocessing.get_context("forkserver")
+            self._context.set_forkserver_preload(["markdown_exec._internal.formatters._python_workers", *self.preload])
+        else:
+            self._context = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(self._context, self.preload) for _ in range(self.size)]
+        self._next_worker = cycle(range(self.size))
+
+    def stop(self) -> None:
+        for worker in self._workers:
+            worker.stop()
+        self._workers.clear()
+        self._affinity.clear()
+
+    def call(
+        self,
+        session: str | None,
+        func: Callable,
+        *args: Any,
+        worker_timeout: float | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        if not self._workers:
+            self.start()
+        # Blocks of a same session always run in the same worker, where the session state lives.
+        if session:
+            if session not in self._affinity:
+                self._affinity[session] = next(self._next_worker)
+            index = self._affinity[session]
+        else:
+            index = next(self._next_worker)
+        context_args = (str(Path.cwd()), _forwarded_environment(), func, args, kwargs)
+        try:
+            return self._workers[index].call(_call_in_context, context_args, {}, worker_timeout)
+        except TimeoutError:
+            _logger.debug("Restarting stuck Python worker %d", index)
+            self._replace(index)
+            raise
+        except _WorkerDiedError:
+            exitcode = self._replace(index)
+            _logger.debug("Restarting dead Python worker %d (exit code %s)", index, exitcode)
+            raise ExecutionError(f"Python worker died while executing the code block (exit code {exitcode}).") from None
+
+    def broadcast(self, func: Callable, *args: Any, **kwargs: Any) -> list[Any]:
+        results = []
+        for index, worker in enumerate(self._workers):
+            try:
+                results.append(worker.call(func, args, kwargs))
+            except _WorkerDiedError:  # noqa: PERF203
+                _logger.debug("Restarting dead Python worker %d", index)
+                self._replace(index)
+        return results
+
+    def _replace(self, index: int) -> int | None:
+        # Replace a stuck or dead worker, losing the state of its sessions. Return the exit code of the old one.
+        worker = self._workers[index]
+        worker.kill()
+        self._workers[index] = _Worker(self._context, self.preload)
+        self._affinity = {session: assigned for session, assigned in self._affinity.items() if assigned != index}
+        return worker.process.exitcode
+
+
+_python_workers = _PythonWorkers()
+atexit.register(_python_workers.stop)
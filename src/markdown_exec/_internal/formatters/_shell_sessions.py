@@ -0,0 +1,251 @@
+# Shell processes executing code blocks, and long-lived ones backing shell sessions.
+
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import shlex
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import suppress
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+from markdown_exec._internal.timings import _execution_timings
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+def _kill(process: subprocess.Popen | asyncio.subprocess.Process, *, group: bool) -> None:
+    # Kill the whole process group when the shell leads one, so that commands started by the shell do not survive it.
+    if group and hasattr(os, "killpg"):
+        with suppress(ProcessLookupError, PermissionError):
+            os.killpg(process.pid, signal.SIGKILL)
+    else:
+        with suppress(ProcessLookupError):
+            process.kill()
+
+
+def _run_shell(shell: str, code: str, timeout: float | None = None) -> tuple[str, int]:
+    process = subprocess.Popen(  # noqa: S603
+        [shell, "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf8",
+        # A process group is only needed to kill the shell and its commands on timeout,
+        # and would detach them from the terminal (Ctrl-C would not reach them).
+        start_new_session=timeout is not None,
+    )
+    try:
+        stdout, _ = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired as error:
+        _kill(process, group=True)
+        stdout, _ = process.communicate()
+        raise subprocess.TimeoutExpired(error.cmd, error.timeout, output=stdout) from None
+    return stdout, process.returncode
+
+
+async def _run_shell_async(
+    shell: str,
+    code: str,
+    timeout: float | None = None,
+    *,
+    cwd: str | None = None,
+    env: dict[str, str] | None = None,
+) -> tuple[str, int]:
+    # Same as `_run_shell`, without blocking the event loop. The working directory and environment
+    # are passed to the process rather than changed globally, since other blocks run concurrently.
+    # Only hosts rendering asynchronously need asyncio, don't import it for everyone else.
+    import asyncio  # noqa: PLC0415
+
+    process = await asyncio.create_subprocess_exec(
+        shell,
+        "-c",
+        code,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        cwd=cwd,
+        env=env,
+        start_new_session=timeout is not None,
+    )
+    chunks: list[bytes] = []
+
+    async def drain() -> int:
+        # Read output while the process runs, so that it never blocks on a full pipe.
+        while data := await process.stdout.read(65536):  # ty:ignore[possibly-missing-attribute]
+            chunks.append(data)
+        return await process.wait()
+
+    try:
+        returncode = await asyncio.wait_for(drain(), timeout)
+    except asyncio.TimeoutError:
+        _kill(process, group=True)
+        await process.wait()
+        output = _decode(b"".join(chunks), errors="replace")
+        raise subprocess.TimeoutExpired([shell, "-c", code], timeout, output=output) from None  # ty:ignore[invalid-argument-type]
+    return _decode(b"".join(chunks)), returncode
+
+
+def _decode(data: bytes, errors: str = "strict") -> str:
+    # Universal newlines, like subprocesses in text mode.
+    return data.decode("utf8", errors).replace("\r\n", "\n").replace("\r", "\n")
+
+
+class _ShellSession:
+    def __init__(self, shell: str) -> None:
+        # The shell always leads its own process group, so that it can be killed along with its commands
+        # when any block of the session times out. Sessions are closed when we exit, on Ctrl-C too.
+        self.process = subprocess.Popen(  # noqa: S603
+            [shell],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            start_new_session=True,
+        )
+        # Printed after each block along with its exit code, to know where its output ends.
+        self._sentinel = f"__markdown_exec_{uuid4().hex}__".encode()
+        # Output is read by a thread, since pipes cannot be waited on with a timeout on every platform.
+        self._chunks: queue.Queue[bytes] = queue.Queue()
+        self._reader = threading.Thread(target=self._read_chunks, daemon=True)
+        self._reader.start()
+
+    def _read_chunks(self) -> None:
+        fd = self.process.stdout.fileno()  # ty:ignore[possibly-missing-attribute]
+        with suppress(OSError):
+            while data := os.read(fd, 65536):
+                self._chunks.put(data)
+        # End of output, the shell exited.
+        self._chunks.put(b"")
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(
+        self,
+        code: str,
+        timeout: float | None = None,
+        cwd: str | None = None,
+        columns: str | None = None,
+    ) -> tuple[str, int]:
+        # Code is sourced from a file rather than written to the shell's input,
+        # so that it cannot read or consume the commands we send afterwards.
+        with tempfile.NamedTemporaryFile("w", suffix=".sh", delete=False, encoding="utf8") as file:
+            file.write(code)
+        try:
+            command = (
+                f"{self._setup(cwd, columns)}"
+                f". {shlex.quote(file.name)} </dev/null\n"
+                "__markdown_exec_status=$?\n"
+                f"{self._teardown(cwd, columns)}"
+                f"printf '%s%d\\n' '{self._sentinel.decode()}' \"$__markdown_exec_status\"\n"
+            )
+            try:
+                self.process.stdin.write(command.encode())  # ty:ignore[possibly-missing-attribute]
+            except BrokenPipeError:
+                return "", self.process.wait()
+            return self._read_output(timeout)
+        finally:
+            os.unlink(file.name)  # noqa: PTH108
+
+    @staticmethod
+    def _setup(cwd: str | None, columns: str | None) -> str:
+        # The working directory and console width of the block being executed.
+        commands = ""
+        if cwd is not None:
+            commands += f"__markdown_exec_pwd=$PWD\ncd {shlex.quote(cwd)}\n"
+        if columns is not None:
+            commands += (
+                "__markdown_exec_columns=${COLUMNS-}\n__markdown_exec_has_columns=${COLUMNS+1}\n"
+                f"export COLUMNS={shlex.quote(columns)}\n"
+            )
+        return commands
+
+    @staticmethod
+    def _teardown(cwd: str | None, columns: str | None) -> str:
+        # Restore the working directory and console width the shell had before the block.
+        commands = ""
+        if cwd is not None:
+            commands += 'cd "$__markdown_exec_pwd"\n'
+        if columns is not None:
+            commands += 'if [ -n "$__markdown_exec_has_columns" ]; then COLUMNS=$__markdown_exec_columns; else unset COLUMNS; fi\n'
+        return commands
+
+    def _read_output(self, timeout: float | None = None) -> tuple[str, int]:
+        output = bytearray()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                data = self._chunks.get(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                # The session is lost: the shell is killed and restarted by the next block.
+                _kill(self.process, group=True)
+                self.process.wait()
+                raise subprocess.TimeoutExpired(
+                    self.process.args,  # ty:ignore[invalid-argument-type]
+                    timeout,
+                    output=_decode(output, errors="replace"),
+                ) from None
+            if not data:
+                # The shell exited (`exit` or `set -e` in the code for example).
+                return _decode(output), self.process.wait()
+            output += data
+            if output.endswith(b"\n") and (index := output.rfind(self._sentinel)) != -1:
+                returncode = int(output[index + len(self._sentinel) : -1])
+                return _decode(output[:index]), returncode
+
+    def close(self) -> None:
+        with suppress(OSError):
+            self.process.stdin.close()  # ty:ignore[possibly-missing-attribute]
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            _kill(self.process, group=True)
+            self.process.wait()
+        # Commands left running in the background may keep the pipe open.
+        self._reader.join(timeout=5)
+        self.process.stdout.close()  # ty:ignore[possibly-missing-attribute]
+
+
+_shell_sessions: dict[tuple[str, str], _ShellSession] = {}
+
+
+def _run_in_session(
+    shell: str,
+    session: str,
+    code: str,
+    timeout: float | None = None,
+    *,
+    workdir: str | None = None,
+    width: int | None = None,
+) -> tuple[str, int]:
+    shell_session = _shell_sessions.get((shell, session))
+    if shell_session is None or not shell_session.alive:
+        if shell_session is not None:
+            shell_session.close()
+        shell_session = _shell_sessions[(shell, session)] = _ShellSession(shell)
+    _execution_timings.ran_elsewhere()
+    # The shell keeps its own working directory and environment: apply the options of the block,
+    # relying on the formatter having already changed our working directory to `workdir`.
+    return shell_session.run(
+        code,
+        timeout,
+        cwd=os.getcwd() if workdir else None,  # noqa: PTH109
+        columns=str(width) if width else None,
+    )
+
+
+def _close_shell_sessions() -> None:
+    while _shell_sessions:
+        _, shell_session = _shell_sessions.popitem()
+        shell_session.close()
+
+
+atexit.register(_close_shell_sessions)
@@ -11,8 +11,10 @@ from uuid import uuid4
 
 from markupsafe import Markup
 
+from markdown_exec._internal.cache import _execution_cache, _execution_data
 from markdown_exec._internal.logger import get_logger
 from markdown_exec._internal.rendering import MarkdownConverter, add_source, code_block
+from markdown_exec._internal.timings import _execution_timings
 
 if TYPE_CHECKING:
     from collections.abc import Callable, Iterator
@@ -79,6 +81,16 @@ class ExecutionError(Exception):
         self.returncode = returncode
         """The code returned by the execution of the code block."""
 
+    def __reduce__(self) -> tuple[type[ExecutionError], tuple[str, int | None]]:
+        # Keep the return code when sending errors across processes.
+        return self.__class__, (str(self), self.returncode)
+
+
+def _timeout_output(output: str, timeout: float | None) -> str:
+    if output and not output.endswith("\n"):
+        output += "\n"
+    return f"{output}Execution timed out after {timeout:g} seconds."
+
 
 def _format_log_details(details: str, *, strip_fences: bool = False) -> str:
     if strip_fences:
@@ -106,6 +118,8 @@ def base_format(
     update_toc: bool = True,
     workdir: str | None = None,
     width: int | None = None,
+    cache: bool = True,
+    timeout: float | None = None,
     **options: Any,
 ) -> Markup:
     """Execute code and return HTML.
@@ -113,6 +127,9 @@ def base_format(
     Parameters:
         language: The code language.
         run: Function that runs code and returns output.
+            It receives the code, then the `returncode`, `session` and `id` keyword arguments,
+            the `timeout`, `workdir` and `width` keyword arguments when they are set,
+            and the extra options of the code block.
         code: The code to execute.
         md: The Markdown instance.
         html: Whether to inject output as HTML directly, without rendering.
@@ -129,6 +146,9 @@ def base_format(
         update_toc: Whether to include generated headings
             into the Markdown table of contents (toc extension).
         workdir: The working directory to use for the execution.
+        width: The console width to use for the execution.
+        cache: Whether the output can be read from and written to the execution cache.
+        timeout: The maximum number of seconds the execution can take.
         **options: Additional options passed from the formatter.
 
     Returns:
@@ -143,11 +163,41 @@ def base_format(
         source_input = code
         source_output = code
 
-    try:
+    # Options added after the first `run` functions were written are only passed when set,
+    # so that functions not accepting them keep working with blocks not using them.
+    run_options = {
+        name: value
+        for name, value in (("timeout", timeout), ("workdir", workdir), ("width", width))
+        if value is not None
+    }
+
+    def execute() -> str:
         with working_directory(workdir), console_width(width):
-            output = run(source_input, returncode=returncode, session=session, id=id, **extra)
+            return run(source_input, returncode=returncode, session=session, id=id, **run_options, **extra)
+
+    cache_data = _execution_data(
+        run,
+        language,
+        source_input,
+        returncode=returncode,
+        id=id,
+        workdir=workdir,
+        width=width,
+        extra=extra,
+    )
+
+    identifier = id or extra.get("title", "")
+    try:
+        with _execution_timings.measure(_execution_cache.page, language, identifier, session) as timing:
+            try:
+                output = _execution_cache.execute(execute, data=cache_data, session=session, use_cache=cache)
+            finally:
+                timing.cache_status = _execution_cache.status
+                if timing.cache_status == "parallel":
+                    # Executed ahead of time, in another process or concurrently: our CPU times can't tell.
+                    timing.cpu_time = None
+            timing.output_size = len(output)
     except ExecutionError as error:
-        identifier = id or extra.get("title", "")
         identifier = identifier and f"'{identifier}' "
         exit_message = "errors" if error.returncode is None else f"unexpected code {error.returncode}"
         log_message = (
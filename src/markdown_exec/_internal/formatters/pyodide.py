@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import os
 from typing import TYPE_CHECKING, Any
 
 import markdown_exec
@@ -24,7 +25,7 @@ _assets = """
 """
 
 _template = """
-<div class="pyodide" data-install="%(install)s" data-session="%(session)s" data-minlines="%(min_lines)s" data-maxlines="%(max_lines)s">
+<div class="pyodide" data-install="%(install)s" data-session="%(session)s" data-minlines="%(min_lines)s" data-maxlines="%(max_lines)s" data-load="%(load)s">
 <div class="pyodide-editor-bar">
 <span class="pyodide-bar-item">Editor (session: %(session)s)</span><span id="%(id_prefix)srun" title="Run: press Ctrl-Enter" class="pyodide-bar-item pyodide-clickable">%(play_emoji)sRun</span>
 </div>
@@ -32,7 +33,7 @@ _template = """
 <div class="pyodide-editor-bar">
 <span class="pyodide-bar-item">Output</span><span id="%(id_prefix)sclear" class="pyodide-bar-item pyodide-clickable">%(clear_emoji)sClear</span>
 </div>
-<pre><code id="%(id_prefix)soutput" class="pyodide-output"></code></pre>
+<pre><code id="%(id_prefix)soutput" class="pyodide-output">%(placeholder)s</code></pre>
 </div>
 """
 
@@ -41,20 +42,34 @@ _script = """
 document.addEventListener('DOMContentLoaded', (event) => {
     setupPyodide(
         '%(id_prefix)s',
-        install=%(install)s,
+        install=%(install_list)s,
         themeLight='%(theme_light)s',
         themeDark='%(theme_dark)s',
         session='%(session)s',
         minLines=%(min_lines)s,
         maxLines=%(max_lines)s,
+        lazy=%(lazy)s,
     );
 });
 </script>
 """
 
+# Shown in the output of lazily loaded editors until Pyodide starts loading.
+_lazy_placeholder = "Python will load when you focus or run this editor."
+
 _counter = 0
 
 
+def _assets_emitted(md: Markdown) -> bool:
+    # Whether assets were already emitted in the document being converted, recording that they are now.
+    # The HTML stash of the original Markdown instance gets a new list of blocks when it is reset for a new document.
+    stash = getattr(md, "_original_md", md).htmlStash
+    if getattr(stash, "_markdown_exec_pyodide_assets", None) is stash.rawHtmlBlocks:
+        return True
+    stash._markdown_exec_pyodide_assets = stash.rawHtmlBlocks  # ty:ignore[unresolved-attribute]
+    return False
+
+
 def _calculate_height(code: str, extra: dict) -> tuple[int, int]:
     """Calculate height configuration for the Pyodide editor."""
     height = extra.pop("height", "auto")
@@ -77,19 +92,21 @@ def _format_pyodide(code: str, md: Markdown, session: str, extra: dict, **option
 
     version = extra.pop("version", "314.0.2").lstrip("v")
     install = extra.pop("install", "")
-    install = install.split(",") if install else []
+    install = [name.strip() for name in install.split(",") if name.strip()]
     exclude_assets = extra.pop("assets", "1").lower() in {"0", "false", "no", "off"}
     theme = extra.pop("theme", "tomorrow,tomorrow_night")
     if "," not in theme:
         theme = f"{theme},{theme}"
     theme_light, theme_dark = theme.split(",")
     min_lines, max_lines = _calculate_height(code, extra)
+    lazy = extra.pop("load", os.getenv("MARKDOWN_EXEC_PYODIDE_LOAD", "eager")).lower() == "lazy"
 
     zensical = getattr(markdown_exec, "_caller", "") == "zensical"
     data = {
         "id_prefix": f"exec-{_counter}--",
         "initial_code": code,
-        "install": ",".join(install) if zensical else repr(install),
+        "install": ",".join(install),
+        "install_list": repr(install),
         "theme_light": theme_light.strip(),
         "theme_dark": theme_dark.strip(),
         "session": session or "default",
@@ -97,11 +114,14 @@ def _format_pyodide(code: str, md: Markdown, session: str, extra: dict, **option
         "clear_emoji": "" if zensical else _clear_emoji,
         "min_lines": min_lines,
         "max_lines": max_lines,
+        "load": "lazy" if lazy else "eager",
+        "lazy": "true" if lazy else "false",
+        "placeholder": _lazy_placeholder if lazy else "",
     }
     rendered = _template
     if not zensical:
         rendered += _script
     rendered %= data
-    if zensical or exclude_assets:
+    if zensical or exclude_assets or _assets_emitted(md):
         return rendered
     return _assets.format(version=version) + rendered
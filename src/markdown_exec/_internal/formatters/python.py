@@ -2,26 +2,52 @@
 
 from __future__ import annotations
 
+import importlib
+import pickle
 import re
+import signal
 import sys
+import threading
 import traceback
 from collections import defaultdict
+from contextlib import contextmanager
 from functools import partial
-from io import StringIO
-from types import ModuleType
-from typing import Any
+from io import BytesIO
+from types import BuiltinFunctionType, FunctionType, ModuleType
+from typing import TYPE_CHECKING, Any
 
+from markdown_exec._internal.cache import _execution_cache
 from markdown_exec._internal.formatters._exec_python import exec_python
-from markdown_exec._internal.formatters.base import ExecutionError, base_format
+from markdown_exec._internal.formatters._output_buffer import _OutputBuffer
+from markdown_exec._internal.formatters._python_workers import _python_workers
+from markdown_exec._internal.formatters.base import ExecutionError, _timeout_output, base_format
+from markdown_exec._internal.logger import get_logger
 from markdown_exec._internal.rendering import code_block
+from markdown_exec._internal.timings import _execution_timings
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+_logger = get_logger(__name__)
+
+# Extra time given to worker processes before killing them, when the code block does not stop by itself.
+_worker_grace_period = 5
 
 _sessions_globals: dict[str, dict] = defaultdict(dict)
 _sessions_counter: dict[str | None, int] = defaultdict(int)
 _code_blocks: dict[str, list[str]] = {}
+# Code block IDs and module names of each session, kept as long as the session,
+# since functions defined in a block can be called (and fail) in later blocks.
+_sessions_code_blocks: dict[str, list[tuple[str, str]]] = defaultdict(list)
 
 
-def _buffer_print(buffer: StringIO, *texts: str, end: str = "\n", **kwargs: Any) -> None:  # noqa: ARG001
-    buffer.write(" ".join(str(text) for text in texts) + end)
+def _buffer_print(buffer: _OutputBuffer, *texts: str, end: str = "\n", **kwargs: Any) -> None:  # noqa: ARG001
+    # Write each text separately, instead of joining them in a new string.
+    for index, text in enumerate(texts):
+        if index:
+            buffer.write(" ")
+        buffer.write(str(text))
+    buffer.write(end)
 
 
 def _code_block_id(
@@ -43,11 +69,69 @@ def _code_block_id(
     return f"<code block: {code_block_id}>"
 
 
+class _ExecutionTimeout(BaseException):
+    # Not an `Exception`, so that code blocks catching exceptions do not catch it.
+    pass
+
+
+@contextmanager
+def _time_limit(timeout: float | None) -> Iterator[None]:
+    # Signals can only be handled in the main thread, on platforms supporting `SIGALRM`.
+    if not timeout or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _raise_timeout(signum: int, frame: Any) -> None:  # noqa: ARG001
+        raise _ExecutionTimeout
+
+    previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
 def _run_python(
+    code: str,
+    returncode: int | None = None,
+    session: str | None = None,
+    id: str | None = None,  # noqa: A002
+    timeout: float | None = None,
+    *,
+    workdir: str | None = None,  # noqa: ARG001
+    width: int | None = None,  # noqa: ARG001
+    **extra: str,
+) -> str:
+    # The working directory and console width are already applied to our process by the formatter.
+    if _python_workers.enabled:
+        _execution_timings.ran_elsewhere()
+        # The worker is killed if the code block cannot be interrupted (blocking C code for example).
+        worker_timeout = timeout and timeout + _worker_grace_period
+        try:
+            return _python_workers.call(
+                session,
+                _run_python_in_process,
+                code,
+                returncode,
+                session,
+                id,
+                timeout,
+                **extra,
+                worker_timeout=worker_timeout,
+            )
+        except TimeoutError:
+            raise ExecutionError(code_block("python", _timeout_output("", timeout), **extra)) from None
+    return _run_python_in_process(code, returncode, session, id, timeout, **extra)
+
+
+def _run_python_in_process(
     code: str,
     returncode: int | None = None,  # noqa: ARG001
     session: str | None = None,
     id: str | None = None,  # noqa: A002
+    timeout: float | None = None,
     **extra: str,
 ) -> str:
     title = extra.get("title")
@@ -63,22 +147,223 @@ def _run_python(
     module_name = re.sub(r"[^a-zA-Z\d]+", "_", code_block_id)
     exec_globals["__name__"] = module_name
     sys.modules[module_name] = ModuleType(module_name)
+    if session:
+        _sessions_code_blocks[session].append((code_block_id, module_name))
 
-    buffer = StringIO()
+    buffer = _OutputBuffer.from_environment()
     exec_globals["print"] = partial(_buffer_print, buffer)
 
     try:
-        exec_python(code, code_block_id, exec_globals)
+        with _time_limit(timeout):
+            exec_python(code, code_block_id, exec_globals)
+    except _ExecutionTimeout:
+        raise ExecutionError(code_block("python", _timeout_output(buffer.getvalue(), timeout), **extra)) from None
     except Exception as error:
         trace = traceback.TracebackException.from_exception(error)
         for frame in trace.stack:
-            if frame.filename.startswith("<code block: "):
+            if frame.filename in _code_blocks:
                 if sys.version_info >= (3, 13):
                     frame._lines = _code_blocks[frame.filename][frame.lineno - 1]  # ty:ignore[unresolved-attribute,unsupported-operator,unused-ignore-comment,unused-ignore-comment]
                 else:
                     frame._line = _code_blocks[frame.filename][frame.lineno - 1]  # ty:ignore[unresolved-attribute,unsupported-operator,unused-ignore-comment,unused-ignore-comment]
         raise ExecutionError(code_block("python", "".join(trace.format()), **extra)) from error
-    return buffer.getvalue()
+    else:
+        return buffer.getvalue()
+    finally:
+        buffer.close()
+        if not session:
+            _drop_code_block(code_block_id, module_name)
+
+
+def _drop_code_block(code_block_id: str, module_name: str) -> None:
+    _code_blocks.pop(code_block_id, None)
+    sys.modules.pop(module_name, None)
+
+
+def _purge_code_blocks(session: str | None = None) -> None:
+    sessions = [session] if session else list(_sessions_code_blocks)
+    for name in sessions:
+        for code_block_id, module_name in _sessions_code_blocks.pop(name, ()):
+            _drop_code_block(code_block_id, module_name)
+
+
+def _purge_unused_code_blocks() -> None:
+    # Session blocks get new IDs at each build. Only keep the ones defining functions, classes
+    # or instances still held by their session: they need their module, and their source for tracebacks.
+    for session, code_blocks in _sessions_code_blocks.items():
+        values = _sessions_globals.get(session, {}).values()
+        used = {getattr(value, "__module__", None) for value in values} | {type(value).__module__ for value in values}
+        kept = {}
+        for code_block_id, module_name in code_blocks:
+            if module_name in used:
+                kept[code_block_id, module_name] = None
+            else:
+                _drop_code_block(code_block_id, module_name)
+        code_blocks[:] = kept
+
+
+def _purge_unused_sessions_code_blocks() -> None:
+    _purge_unused_code_blocks()
+    if _python_workers.enabled:
+        _python_workers.broadcast(_purge_unused_code_blocks)
+
+
+def _approximate_size(obj: Any) -> int:
+    # Walk containers and instance attributes, without following modules, classes and functions,
+    # which are shared with the rest of the process. Objects like arrays or data frames
+    # report the size of their data in `__sizeof__`.
+    seen: set[int] = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (ModuleType, type, FunctionType, BuiltinFunctionType, partial)):
+            continue
+        seen.add(id(obj))
+        try:
+            size += sys.getsizeof(obj)
+        except TypeError:
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(getattr(obj, "__dict__", None), dict):
+            stack.append(obj.__dict__)
+    return size
+
+
+def _local_python_state(sizes: bool = False) -> dict[str, dict[str, int]]:  # noqa: FBT001,FBT002
+    state = {}
+    for session in {*_sessions_globals, *_sessions_code_blocks}:
+        exec_globals = _sessions_globals.get(session, {})
+        state[session] = {
+            "globals": len(exec_globals),
+            "code_blocks": len(_sessions_code_blocks.get(session, ())),
+        }
+        if sizes:
+            state[session]["size"] = sum(
+                _approximate_size(value) for name, value in exec_globals.items() if name != "__builtins__"
+            )
+    return state
+
+
+def _purge_local_python_state(session: str | None = None) -> None:
+    _purge_code_blocks(session)
+    if session:
+        _sessions_globals.pop(session, None)
+        _sessions_counter.pop(session, None)
+    else:
+        _sessions_globals.clear()
+        _sessions_counter.clear()
+
+
+def python_state(*, sizes: bool = False) -> dict[str, dict[str, int]]:
+    """Return a summary of the state retained by Python sessions.
+
+    When Python code blocks are executed in worker processes,
+    the state of all workers is merged.
+
+    Parameters:
+        sizes: Whether to compute the approximate size (in bytes) of the variables of each session.
+            Computing sizes walks every object reachable from these variables.
+
+    Returns:
+        For each session name, the number of global variables
+        and of code blocks (source lines and module objects) it retains,
+        and optionally its approximate size.
+    """
+    states = [_local_python_state(sizes)]
+    if _python_workers.enabled:
+        states.extend(_python_workers.broadcast(_local_python_state, sizes))
+    summary: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for state in states:
+        for session, counts in state.items():
+            for key, count in counts.items():
+                summary[session][key] += count
+    return {session: dict(counts) for session, counts in summary.items()}
+
+
+def purge_python_state(session: str | None = None) -> None:
+    """Release the state retained by a Python session, or by all sessions.
+
+    This drops the global variables of the session, as well as the source lines
+    and module objects (in `sys.modules`) of its code blocks.
+    The next code block of a purged session starts from an empty state.
+
+    Parameters:
+        session: The session to purge. All sessions are purged if not provided.
+    """
+    _purge_local_python_state(session)
+    if _python_workers.enabled:
+        _python_workers.broadcast(_purge_local_python_state, session)
+
+
+class _SessionPickler(pickle.Pickler):
+    def persistent_id(self, obj: Any) -> Any:
+        # Modules cannot be pickled, they are imported again when restoring the session.
+        if isinstance(obj, ModuleType):
+            return ("module", obj.__name__)
+        return None
+
+
+class _SessionUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid: Any) -> Any:
+        _, name = pid
+        return importlib.import_module(name)
+
+
+def _snapshot_session(session: str) -> bytes | None:
+    if _python_workers.enabled:
+        return _python_workers.call(session, _snapshot_session_in_process, session)
+    return _snapshot_session_in_process(session)
+
+
+def _snapshot_session_in_process(session: str) -> bytes | None:
+    # Each global is pickled separately, so that a single unpicklable value
+    # only makes the checkpoint incomplete: its name is recorded for the restore.
+    pickled: dict[str, bytes] = {}
+    skipped: list[str] = []
+    for name, value in _sessions_globals[session].items():
+        if name in {"__builtins__", "print"}:
+            continue
+        buffer = BytesIO()
+        try:
+            _SessionPickler(buffer).dump(value)
+        except Exception as error:  # noqa: BLE001
+            _logger.debug("Global '%s' of session '%s' cannot be checkpointed: %s", name, session, error)
+            skipped.append(name)
+        else:
+            pickled[name] = buffer.getvalue()
+    return pickle.dumps((pickled, skipped))
+
+
+def _restore_session(session: str, state: bytes) -> None:
+    if _python_workers.enabled:
+        _python_workers.call(session, _restore_session_in_process, session, state)
+    else:
+        _restore_session_in_process(session, state)
+
+
+def _restore_session_in_process(session: str, state: bytes) -> None:
+    pickled, skipped = pickle.loads(state)  # noqa: S301
+    exec_globals = {}
+    for name, value in pickled.items():
+        try:
+            exec_globals[name] = _SessionUnpickler(BytesIO(value)).load()
+        except Exception as error:  # noqa: BLE001,PERF203
+            _logger.debug("Global '%s' of session '%s' cannot be restored: %s", name, session, error)
+            skipped.append(name)
+    if skipped:
+        # Restoring only part of the state would break the next blocks:
+        # the cache falls back to an earlier checkpoint, or replays the blocks.
+        raise ValueError(f"missing globals: {', '.join(skipped)}")
+    _sessions_globals[session].clear()
+    _sessions_globals[session].update(exec_globals)
+
+
+_execution_cache.register_checkpointer(_run_python, _snapshot_session, _restore_session)
 
 
 def _format_python(**kwargs: Any) -> str:
@@ -2,31 +2,56 @@
 
 from __future__ import annotations
 
+import os
 import subprocess
 from typing import Any
 
-from markdown_exec._internal.formatters.base import ExecutionError, base_format
+from markdown_exec._internal.formatters._shell_sessions import _run_in_session, _run_shell, _run_shell_async
+from markdown_exec._internal.formatters.base import ExecutionError, _timeout_output, base_format
 from markdown_exec._internal.rendering import code_block
 
 
 def _run_sh(
     code: str,
     returncode: int | None = None,
-    session: str | None = None,  # noqa: ARG001
+    session: str | None = None,
     id: str | None = None,  # noqa: A002,ARG001
+    timeout: float | None = None,
+    *,
+    workdir: str | None = None,
+    width: int | None = None,
     **extra: str,
 ) -> str:
-    process = subprocess.run(  # noqa: S603
-        ["sh", "-c", code],  # noqa: S607
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        check=False,
-        encoding="utf8",
-    )
-    if process.returncode != returncode:
-        raise ExecutionError(code_block("sh", process.stdout, **extra), process.returncode)
-    return process.stdout
+    try:
+        if session:
+            output, exit_code = _run_in_session("sh", session, code, timeout, workdir=workdir, width=width)
+        else:
+            output, exit_code = _run_shell("sh", code, timeout)
+    except subprocess.TimeoutExpired as error:
+        raise ExecutionError(code_block("sh", _timeout_output(error.output, timeout), **extra)) from None
+    if exit_code != returncode:
+        raise ExecutionError(code_block("sh", output, **extra), exit_code)
+    return output
+
+
+async def _run_sh_async(
+    code: str,
+    returncode: int | None = None,
+    id: str | None = None,  # noqa: A002,ARG001
+    timeout: float | None = None,
+    *,
+    workdir: str | None = None,
+    width: int | None = None,
+    **extra: str,
+) -> str:
+    env = {**os.environ, "COLUMNS": str(width)} if width else None
+    try:
+        output, exit_code = await _run_shell_async("sh", code, timeout, cwd=workdir, env=env)
+    except subprocess.TimeoutExpired as error:
+        raise ExecutionError(code_block("sh", _timeout_output(error.output, timeout), **extra)) from None
+    if exit_code != returncode:
+        raise ExecutionError(code_block("sh", output, **extra), exit_code)
+    return output
 
 
 def _format_sh(**kwargs: Any) -> str:
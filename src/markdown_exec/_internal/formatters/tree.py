@@ -2,170 +2,336 @@
 
 from __future__ import annotations
 
+import hashlib
+import os
 import re
+from contextlib import suppress
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from importlib.util import find_spec
 from pathlib import Path
 from textwrap import dedent
 from typing import TYPE_CHECKING, Any
-from uuid import uuid4
 
 from markupsafe import Markup
 
+from markdown_exec._internal.logger import get_logger
 from markdown_exec._internal.rendering import MarkdownConverter, code_block
 
-try:
-    import material  # ty:ignore[unresolved-import]
-except ImportError:
-    material = None
-
-try:
-    import zensical
-except ImportError:
-    zensical = None  # ty:ignore[invalid-assignment]
-
 if TYPE_CHECKING:
+    from collections.abc import Iterator
+
     from markdown import Markdown
 
+_logger = get_logger(__name__)
+
+
+def _find_icons_path() -> Path | None:
+    # Look for the icons shipped with Material for MkDocs or Zensical, without importing them.
+    for package in ("material", "zensical"):
+        with suppress(ImportError, ValueError):
+            if (spec := find_spec(package)) and spec.origin:
+                return Path(spec.origin).parent / "templates" / ".icons"
+    return None
+
+
+_icons_path = _find_icons_path()
+
+# Icons of files, by name or extension (`*.ext`).
+_icons = {
+    "*.cpp": ":simple-cplusplus:",
+    "*.hpp": ":simple-cplusplus:",
+    "*.c": ":simple-c:",
+    "*.h": ":simple-c:",
+    "*.css": ":simple-css:",
+    "Dockerfile": ":simple-docker:",
+    "*.fish": ":simple-fishshell:",
+    "*.fs": ":simple-fsharp:",
+    "*.fsi": ":simple-fsharp:",
+    "*.fsx": ":simple-fsharp:",
+    ".gitattributes": ":simple-git:",
+    ".gitignore": ":simple-git:",
+    "*.go": ":simple-go:",
+    "*.gradle": ":simple-gradle:",
+    "*.groovy": ":simple-apachegroovy:",
+    "*.html": ":simple-html5:",
+    "*.ico": ":simple-icon:",
+    "*.jinja": ":simple-jinja:",
+    "*.jpg": ":simple-jpeg:",
+    "*.jpeg": ":simple-jpeg:",
+    "*.json": ":simple-json:",
+    "*.js": ":simple-javascript:",
+    "*.jsx": ":simple-react:",
+    "*.tsx": ":simple-react:",
+    "*.kt": ":simple-kotlin:",
+    "*.kts": ":simple-kotlin:",
+    "*.lua": ":simple-lua:",
+    "*.md": ":simple-markdown:",
+    "*.odt": ":simple-libreofficewriter:",
+    "*.php": ":simple-php:",
+    "*.py": ":simple-python:",
+    "*.pyc": ":simple-python:",
+    "*.pyo": ":simple-python:",
+    "*.pyd": ":simple-python:",
+    "*.pyx": ":simple-python:",
+    "*.rb": ":simple-ruby:",
+    "*.rs": ":simple-rust:",
+    "*.scala": ":simple-scala:",
+    "*.scss": ":simple-sass:",
+    "*.sh": ":simple-gnubash:",
+    "*.svg": ":simple-svg:",
+    "*.tex": ":simple-latex:",
+    "*.toml": ":simple-toml:",
+    "*.ts": ":simple-typescript:",
+    "*.yml": ":simple-yaml:",
+    "*.yaml": ":simple-yaml:",
+    "*.zsh": ":simple-zsh:",
+}
+
+# Additional icons configured by users, taking precedence over the default ones.
+_custom_icons: dict[str, str] = {}
+
+_default_icon = ":material-file:"
+
+# Placeholders for icons in the rendered tree, replaced by SVG icons after highlighting.
+_icon_ids: dict[str, str] = {}
+_icon_names: dict[str, str] = {}
+_re_icon_id = re.compile(r"__ICON_[0-9a-f]{32}")
+
+
+def _icon_id(icon: str) -> str:
+    if icon not in _icon_ids:
+        # Derived from the icon name, so that builds are reproducible.
+        _icon_ids[icon] = icon_id = f"__ICON_{hashlib.sha256(icon.encode()).hexdigest()[:32]}"
+        _icon_names[icon_id] = icon
+    return _icon_ids[icon]
+
+
+@lru_cache(maxsize=128)
+def _icon_to_svg(icon: str) -> str:
+    return _icons_path.joinpath(*f"{icon.strip(':')}.svg".split("-", 1)).read_text(encoding="utf8")  # ty:ignore[possibly-missing-attribute]
+
+
+def _load_icon(icon: str) -> str:
+    try:
+        return _icon_to_svg(icon)
+    except OSError:
+        _logger.warning(f"Icon {icon} not found in {_icons_path}, using {_default_icon} instead")
+        return _icon_to_svg(_default_icon)
+
+
+def _replace_icon(match: re.Match) -> str:
+    return f'<span class="twemoji">{_load_icon(_icon_names[match[0]])}</span>'
+
+
+_re_svg = re.compile(r"<svg([^>]*)>(.*)</svg>", re.DOTALL)
+_re_view_box = re.compile(r'viewBox="([^"]*)"')
+
+
+def _icon_symbol(icon: str, symbol_id: str) -> str:
+    svg = _load_icon(icon)
+    if not (match := _re_svg.search(svg)):
+        return f'<symbol id="{symbol_id}">{svg}</symbol>'
+    view_box = _re_view_box.search(match[1])
+    view_box_attr = f' viewBox="{view_box[1]}"' if view_box else ""
+    return f'<symbol id="{symbol_id}"{view_box_attr}>{match[2]}</symbol>'
 
-if material is not None or zensical is not None:
-    if material is not None:
-        _icons_path = Path(material.__file__).parent / "templates" / ".icons"
-    elif zensical is not None:
-        _icons_path = Path(zensical.__file__).parent / "templates" / ".icons"
-
-    _icons = {
-        "*.cpp": ":simple-cplusplus:",
-        "*.hpp": ":simple-cplusplus:",
-        "*.c": ":simple-c:",
-        "*.h": ":simple-c:",
-        "*.css": ":simple-css:",
-        "Dockerfile": ":simple-docker:",
-        "*.fish": ":simple-fishshell:",
-        "*.fs": ":simple-fsharp:",
-        "*.fsi": ":simple-fsharp:",
-        "*.fsx": ":simple-fsharp:",
-        ".gitattributes": ":simple-git:",
-        ".gitignore": ":simple-git:",
-        "*.go": ":simple-go:",
-        "*.gradle": ":simple-gradle:",
-        "*.groovy": ":simple-apachegroovy:",
-        "*.html": ":simple-html5:",
-        "*.ico": ":simple-icon:",
-        "*.jinja": ":simple-jinja:",
-        "*.jpg": ":simple-jpeg:",
-        "*.jpeg": ":simple-jpeg:",
-        "*.json": ":simple-json:",
-        "*.js": ":simple-javascript:",
-        "*.jsx": ":simple-react:",
-        "*.tsx": ":simple-react:",
-        "*.kt": ":simple-kotlin:",
-        "*.kts": ":simple-kotlin:",
-        "*.lua": ":simple-lua:",
-        "*.md": ":simple-markdown:",
-        "*.odt": ":simple-libreofficewriter:",
-        "*.php": ":simple-php:",
-        "*.py": ":simple-python:",
-        "*.pyc": ":simple-python:",
-        "*.pyo": ":simple-python:",
-        "*.pyd": ":simple-python:",
-        "*.pyx": ":simple-python:",
-        "*.rb": ":simple-ruby:",
-        "*.rs": ":simple-rust:",
-        "*.scala": ":simple-scala:",
-        "*.scss": ":simple-sass:",
-        "*.sh": ":simple-gnubash:",
-        "*.svg": ":simple-svg:",
-        "*.tex": ":simple-latex:",
-        "*.toml": ":simple-toml:",
-        "*.ts": ":simple-typescript:",
-        "*.yml": ":simple-yaml:",
-        "*.yaml": ":simple-yaml:",
-        "*.zsh": ":simple-zsh:",
-    }
-
-    _icon_ids: dict[str | None, str] = {name: f"__ICON_{uuid4().hex}" for name in _icons.values()}
-    _icon_ids[None] = f"__ICON_{uuid4().hex}"
-
-    def _icon_to_svg(icon: str) -> str:
-        return _icons_path.joinpath(*f"{icon.strip(':')}.svg".split("-", 1)).read_text(encoding="utf8")
-
-    _svg_icons: dict[str | None, str] = {_icon_ids[value]: _icon_to_svg(value) for value in _icons.values()}
-    _svg_icons[_icon_ids[None]] = _icon_to_svg(":material-file:")
-
-    _re_icon_id = re.compile(r"__ICON_([0-9a-f]{32})")
-
-    def _replace_icon(match: re.Match) -> str:
-        return f'<span class="twemoji">{_svg_icons[match[0]]}</span>'
-
-    def _file_icon(name: str) -> str:
-        if name in _icons:
-            return _icon_ids[_icons[name]]
-        if (ext := f"*.{name.rsplit('.', 1)[-1]}") in _icons:
-            return _icon_ids[_icons[ext]]
-        return _icon_ids[None]
-
-else:
-
-    def _file_icon(name: str) -> str:  # noqa: ARG001
+
+def _sprite_icons(html: str, prefix: str) -> str:
+    # Each icon is defined once as a symbol, and referenced by every file using it.
+    symbols: dict[str, tuple[str, str]] = {}
+
+    def _use_icon(match: re.Match) -> str:
+        icon = _icon_names[match[0]]
+        if icon not in symbols:
+            symbol_id = f"{prefix}{len(symbols)}"
+            symbols[icon] = (symbol_id, _icon_symbol(icon, symbol_id))
+        return f'<span class="twemoji"><svg><use href="#{symbols[icon][0]}"></use></svg></span>'
+
+    html = _re_icon_id.sub(_use_icon, html)
+    if not symbols:
+        return html
+    sprite = "".join(symbol for _, symbol in symbols.values())
+    return f'<svg xmlns="http://www.w3.org/2000/svg" style="display: none">{sprite}</svg>\n{html}'
+
+
+def _file_icon(name: str) -> str:
+    if _icons_path is None:
         return "📄"
+    ext = f"*.{name.rsplit('.', 1)[-1]}"
+    for icons in (_custom_icons, _icons):
+        if name in icons:
+            return _icon_id(icons[name])
+        if ext in icons:
+            return _icon_id(icons[ext])
+    return _icon_id(_default_icon)
 
 
-def _rec_build_tree(lines: list[str], parent: list, offset: int, base_indent: int) -> int:
-    while offset < len(lines):
-        line = lines[offset]
-        lstripped = line.lstrip()
-        indent = len(line) - len(lstripped)
-        if indent == base_indent:
-            parent.append((lstripped, []))
-            offset += 1
-        elif indent > base_indent:
-            offset = _rec_build_tree(lines, parent[-1][1], offset, indent)
+_max_scan_cache_size = 32
+_default_scan_limit = 1000
+
+# Listings of scanned directories, with the modification times of the scanned directories,
+# by scan options. Entries are valid as long as no directory changed.
+_scan_cache: dict[tuple[str, int | None, tuple[str, ...], int], tuple[list[tuple[str, int]], str]] = {}
+
+
+def _parse_ignore(patterns: str) -> list[tuple[str, bool, bool, bool]]:
+    # Gitignore-style patterns: `!` negates, a trailing `/` only matches directories,
+    # and a pattern containing `/` is matched against the path relative to the root.
+    rules = []
+    for raw_pattern in patterns.split(","):
+        pattern = raw_pattern.strip()
+        if not pattern or pattern.startswith("#"):
+            continue
+        negate = pattern.startswith("!")
+        pattern = pattern.removeprefix("!")
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        rules.append((pattern.lstrip("/"), negate, dir_only, anchored))
+    return rules
+
+
+def _ignored(rules: list[tuple[str, bool, bool, bool]], name: str, relpath: str, *, is_dir: bool) -> bool:
+    ignored = False
+    for pattern, negate, dir_only, anchored in rules:
+        if dir_only and not is_dir:
+            continue
+        if fnmatchcase(relpath if anchored else name, pattern):
+            ignored = not negate
+    return ignored
+
+
+def _scan_tree(root: Path, depth: int | None, ignore: str, limit: int) -> str:
+    key = (str(root.resolve()), depth, tuple(ignore.split(",")), limit)
+    if (cached := _scan_cache.get(key)) and all(_mtime(path) == mtime for path, mtime in cached[0]):
+        return cached[1]
+
+    rules = _parse_ignore(ignore)
+    scanned: list[tuple[str, int]] = []
+
+    def _list_dir(path: str, relpath: str) -> Iterator[tuple[str, str, bool]]:
+        scanned.append((path, _mtime(path)))
+        entries = []
+        try:
+            with os.scandir(path) as iterator:
+                for entry in iterator:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    entry_relpath = f"{relpath}{entry.name}"
+                    if not _ignored(rules, entry.name, entry_relpath, is_dir=is_dir):
+                        entries.append((entry.name, entry.path, is_dir))
+        except OSError as error:
+            _logger.debug(f"Could not scan directory {path}: {error}")
+        # Directories first, then files, alphabetically.
+        entries.sort(key=lambda entry: (not entry[2], entry[0].lower()))
+        return iter(entries)
+
+    lines = [f"{root.name or root.resolve().name}/"]
+    # Stack of directory iterators, and relative paths of the directories.
+    stack = [(_list_dir(str(root), ""), "")]
+    count = 0
+    while stack:
+        iterator, relpath = stack[-1]
+        entry = next(iterator, None)
+        if entry is None:
+            stack.pop()
+            continue
+        indent = "    " * len(stack)
+        if count >= limit:
+            lines.append(f"{indent}…")
+            break
+        count += 1
+        name, entry_path, is_dir = entry
+        if is_dir:
+            lines.append(f"{indent}{name}/")
+            if depth is None or len(stack) < depth:
+                stack.append((_list_dir(entry_path, f"{relpath}{name}/"), f"{relpath}{name}/"))
         else:
-            return offset
-    return offset
+            lines.append(f"{indent}{name}")
+
+    listing = "\n".join(lines)
+    if len(_scan_cache) >= _max_scan_cache_size:
+        del _scan_cache[next(iter(_scan_cache))]
+    _scan_cache[key] = (scanned, listing)
+    return listing
+
+
+def _mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns  # noqa: PTH116
+    except OSError:
+        return -1
 
 
 def _build_tree(code: str) -> list[tuple[str, list]]:
-    lines = dedent(code.strip()).split("\n")
     root_layer: list[tuple[str, list]] = []
-    _rec_build_tree(lines, root_layer, 0, 0)
+    # Stack of open layers: indentation of their nodes, and the nodes themselves.
+    stack: list[tuple[int, list[tuple[str, list]]]] = [(0, root_layer)]
+    for line in dedent(code.strip()).split("\n"):
+        lstripped = line.lstrip()
+        indent = len(line) - len(lstripped)
+        while stack[-1][0] > indent:
+            stack.pop()
+        base_indent, layer = stack[-1]
+        if indent > base_indent:
+            # Deeper indentation: the line opens a layer under the previous node.
+            layer = layer[-1][1]
+            stack.append((indent, layer))
+        layer.append((lstripped, []))
     return root_layer
 
 
-def _rec_format_tree(tree: list[tuple[str, list]], *, root: bool = True, icons: str = "auto") -> list[str]:
-    lines = []
-    n_items = len(tree)
+def _iter_format_tree(tree: list[tuple[str, list]], *, icons: str = "auto") -> Iterator[str]:
     folder_icon = "" if icons == "none" else "📁 "
-    for index, node in enumerate(tree):
-        last = index == n_items - 1
-        prefix = "" if root else f"{'└' if last else '├'}── "
-        if node[1]:
-            lines.append(f"{prefix}{folder_icon}{node[0]}")
-            sublines = _rec_format_tree(node[1], root=False, icons=icons)
-            if root:
-                lines.extend(sublines)
-            else:
-                indent_char = " " if last else "│"
-                lines.extend([f"{indent_char}   {line}" for line in sublines])
+    # Stack of layers being formatted: their nodes, the indices of the remaining nodes,
+    # and the indentation of their lines (none for the root layer).
+    stack: list[tuple[list[tuple[str, list]], Iterator[int], str | None]] = [(tree, iter(range(len(tree))), None)]
+    while stack:
+        nodes, indices, indent = stack[-1]
+        index = next(indices, None)
+        if index is None:
+            stack.pop()
+            continue
+        name, children = nodes[index]
+        last = index == len(nodes) - 1
+        prefix = "" if indent is None else f"{indent}{'└' if last else '├'}── "
+        if children:
+            yield f"{prefix}{folder_icon}{name}"
+            children_indent = "" if indent is None else f"{indent}{' ' if last else '│'}   "
+            stack.append((children, iter(range(len(children))), children_indent))
         else:
-            name = node[0].split()[0]
+            file_name = name.split()[0]
             icon = (
                 ""
                 if icons == "none"
                 else folder_icon
-                if name.endswith("/")
-                else f"{_file_icon(name)} "
+                if file_name.endswith("/")
+                else f"{_file_icon(file_name)} "
                 if icons != "basic"
                 else "📄 "
             )
-            lines.append(f"{prefix}{icon}{node[0]}")
-    return lines
+            yield f"{prefix}{icon}{name}"
 
 
-def _format_tree(code: str, md: Markdown, result: str, extra: dict, **options: Any) -> str:  # noqa: ARG001
+def _format_tree(code: str, md: Markdown, result: str, extra: dict, **options: Any) -> str:
     markdown = MarkdownConverter(md)
     icons = extra.pop("icons", "auto")
-    output = "\n".join(_rec_format_tree(_build_tree(code), icons=icons))
+    if path := extra.pop("path", None):
+        depth = extra.pop("depth", None)
+        root = Path(options.get("workdir") or ".", path)
+        code = _scan_tree(
+            root,
+            depth=int(depth) if depth else None,
+            ignore=extra.pop("ignore", ""),
+            limit=int(extra.pop("limit", _default_scan_limit)),
+        )
+    sprite = extra.pop("sprite", "no").lower() not in {"", "no", "off", "false", "0"}
+    output = "\n".join(_iter_format_tree(_build_tree(code), icons=icons))
     converted = markdown.convert(code_block(result or "bash", output, **extra))
-    if icons != "basic" and (material is not None or zensical is not None):
+    if icons != "basic" and _icons_path is not None:
+        if sprite:
+            # Unique per conversion like `exec-N--` ID prefixes, and identical from one build to the next.
+            prefix = f"markdown-exec-icon-{MarkdownConverter.counter}-"
+            return Markup(_sprite_icons(str(converted), prefix))  # noqa: S704
         return Markup(_re_icon_id.sub(_replace_icon, str(converted)))  # noqa: S704
     return converted
@@ -2,20 +2,25 @@ from __future__ import annotations
 
 import os
 import re
+from functools import partial
 from typing import TYPE_CHECKING, Any
 
-from markdown_exec._internal.formatters.base import default_tabs
-from markdown_exec._internal.formatters.bash import _format_bash
+from markdown_exec._internal.cache import _execution_cache, _execution_data
+from markdown_exec._internal.formatters.base import ExecutionError, default_tabs
+from markdown_exec._internal.formatters.bash import _format_bash, _run_bash, _run_bash_async
 from markdown_exec._internal.formatters.console import _format_console
+from markdown_exec._internal.formatters.console import _transform_source as _transform_console_source
 from markdown_exec._internal.formatters.markdown import _format_markdown
 from markdown_exec._internal.formatters.pycon import _format_pycon
 from markdown_exec._internal.formatters.pyodide import _format_pyodide
 from markdown_exec._internal.formatters.python import _format_python
-from markdown_exec._internal.formatters.sh import _format_sh
+from markdown_exec._internal.formatters.sh import _format_sh, _run_sh, _run_sh_async
 from markdown_exec._internal.formatters.tree import _format_tree
 from markdown_exec._internal.logger import get_logger
 
 if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
     from markdown import Markdown
 
 MARKDOWN_EXEC_AUTO = [lang.strip() for lang in os.getenv("MARKDOWN_EXEC_AUTO", "").split(",")]
@@ -38,6 +43,17 @@ formatters = {
 }
 """Formatters for each language."""
 
+# Languages whose code blocks can be executed asynchronously, with the run function
+# of their formatter (part of cache keys), its asynchronous variant, and their source transformation.
+_async_runners: dict[
+    str,
+    tuple[Callable[..., str], Callable[..., Awaitable[str]], Callable[[str], tuple[str, str]] | None],
+] = {
+    "bash": (_run_bash, _run_bash_async, None),
+    "console": (_run_sh, _run_sh_async, _transform_console_source),
+    "sh": (_run_sh, _run_sh_async, None),
+}
+
 # negative look behind: matches only if | (pipe) if not preceded by \ (backslash)
 _tabs_re = re.compile(r"(?<!\\)\|")
 
@@ -76,6 +92,8 @@ def validator(
     tabs = tuple(_tabs_re.split(tabs_value, maxsplit=1))
     workdir_value = inputs.pop("workdir", None)
     width_value = int(inputs.pop("width", "0"))
+    cache_value = _to_bool(inputs.pop("cache", "yes"))
+    timeout_value = float(inputs.pop("timeout", os.getenv("MARKDOWN_EXEC_TIMEOUT", "0")))
     options["id"] = id_value
     options["id_prefix"] = id_prefix_value
     options["html"] = html_value
@@ -87,6 +105,8 @@ def validator(
     options["tabs"] = tabs
     options["workdir"] = workdir_value
     options["width"] = width_value
+    options["cache"] = cache_value
+    options["timeout"] = timeout_value or None
     options["extra"] = inputs
     return True
 
@@ -124,5 +144,78 @@ def formatter(
     return fmt(code=source, md=md, **options)  # type: ignore[operator]
 
 
+async def async_formatter(  # noqa: PLR0917
+    source: str,
+    language: str,
+    css_class: str,
+    options: dict[str, Any],
+    md: Markdown,
+    classes: list[str] | None = None,
+    id_value: str = "",
+    attrs: dict[str, Any] | None = None,
+    **kwargs: Any,
+) -> str:
+    """Execute code asynchronously and return HTML.
+
+    Shell code blocks (`bash`, `console`, `sh`) that are not part of a session
+    are executed in asyncio subprocesses, so that hosts rendering pages concurrently
+    can overlap their execution. Other code blocks are executed like with
+    [`formatter`][markdown_exec.formatter], blocking the event loop.
+
+    Parameters:
+        source: The code to execute.
+        language: The code language, like python or bash.
+        css_class: The CSS class to add to the HTML element.
+        options: The container for options.
+        md: The Markdown instance.
+        classes: Additional CSS classes.
+        id_value: An optional HTML id.
+        attrs: Additional attributes
+        **kwargs: Additional arguments passed to SuperFences default formatters.
+
+    Returns:
+        HTML contents.
+    """
+    prefetched = await _execute_async(language, source, options)
+    if prefetched is None:
+        return formatter(source, language, css_class, options, md, classes, id_value, attrs, **kwargs)
+    with _execution_cache.prefetched(*prefetched):
+        return formatter(source, language, css_class, options, md, classes, id_value, attrs, **kwargs)
+
+
+async def _execute_async(
+    language: str,
+    code: str,
+    options: dict[str, Any],
+) -> tuple[dict[str, Any], Callable[[Callable[[], str]], str]] | None:
+    # Execute the code block ahead of rendering, like parallel execution does.
+    # Return the cache data of the block and a function resolving its output, if executed.
+    if language not in _async_runners or options.get("session") or "extra" not in options:
+        return None
+    run, run_async, transform_source = _async_runners[language]
+    if transform_source:
+        code, _ = transform_source(code)
+    data = _execution_data(run, language, code, **options)
+    if options["cache"] and _execution_cache.contains(data):
+        return None
+    try:
+        output = await run_async(
+            code,
+            returncode=options["returncode"],
+            id=options["id"],
+            timeout=options["timeout"],
+            workdir=options["workdir"],
+            width=options["width"],
+            **options["extra"],
+        )
+    except ExecutionError as error:
+        return data, partial(_reraise, error)
+    return data, lambda _run: output
+
+
+def _reraise(error: ExecutionError, run: Callable[[], str]) -> str:  # noqa: ARG001
+    raise error
+
+
 def _to_bool(value: str) -> bool:
     return value.lower() not in {"", "no", "off", "false", "0"}
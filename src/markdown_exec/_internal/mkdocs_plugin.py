@@ -13,9 +13,20 @@ from mkdocs.exceptions import PluginError
 from mkdocs.plugins import BasePlugin
 from mkdocs.utils import write_file
 
-from markdown_exec._internal.logger import patch_loggers
+from markdown_exec._internal.cache import _execution_cache
+from markdown_exec._internal.formatters._python_workers import _python_workers
+from markdown_exec._internal.formatters._shell_sessions import _close_shell_sessions
+from markdown_exec._internal.formatters.python import (
+    _purge_unused_sessions_code_blocks,
+    purge_python_state,
+    python_state,
+)
+from markdown_exec._internal.formatters.tree import _custom_icons
+from markdown_exec._internal.logger import get_logger, patch_loggers
 from markdown_exec._internal.main import formatter, formatters, validator
+from markdown_exec._internal.parallel import _parallel_executor
 from markdown_exec._internal.rendering import MarkdownConverter, markdown_config
+from markdown_exec._internal.timings import _execution_timings
 
 if TYPE_CHECKING:
     from collections.abc import MutableMapping
@@ -23,6 +34,7 @@ if TYPE_CHECKING:
     from jinja2 import Environment
     from mkdocs.config.defaults import MkDocsConfig
     from mkdocs.structure.files import Files
+    from mkdocs.structure.pages import Page
 
 try:
     __import__("pygments_ansi_color")
@@ -47,6 +59,16 @@ def _get_logger(name: str) -> _LoggerAdapter:
 
 
 patch_loggers(_get_logger)
+_logger = get_logger(__name__)
+
+
+# Environment variables set from the plugin options, and restored at the end of the build.
+_plugin_variables = {
+    "timeout": "MARKDOWN_EXEC_TIMEOUT",
+    "output_limit": "MARKDOWN_EXEC_OUTPUT_LIMIT",
+    "output_truncate": "MARKDOWN_EXEC_OUTPUT_TRUNCATE",
+    "pyodide_load": "MARKDOWN_EXEC_PYODIDE_LOAD",
+}
 
 
 class MarkdownExecPluginConfig(Config):
@@ -59,11 +81,60 @@ class MarkdownExecPluginConfig(Config):
         default=list(formatters.keys()),
     )
     """Which languages to enabled the extension for."""
+    cache = config_options.Type(bool, default=False)
+    """Whether to cache the output of executed code blocks on disk."""
+    cache_dir = config_options.Type(str, default=".cache/markdown-exec")
+    """The cache directory, relative to the configuration file."""
+    parallel = config_options.Type(bool, default=False)
+    """Whether to execute code blocks without sessions in parallel, before rendering pages."""
+    max_workers = config_options.Optional(config_options.Type(int))
+    """The maximum number of processes used for parallel execution (defaults to the number of CPUs)."""
+    checkpoints = config_options.Type(bool, default=False)
+    """Whether to checkpoint the state of Python sessions after each block, to avoid replaying previous blocks."""
+    incremental = config_options.Type(bool, default=False)
+    """Whether to only execute new or changed code blocks (and the next blocks of their sessions) when serving docs."""
+    timeout = config_options.Optional(config_options.Type((int, float)))
+    """The default maximum number of seconds a code block can take to execute."""
+    timings = config_options.Type(bool, default=False)
+    """Whether to time the execution of code blocks, and log the slowest ones."""
+    timings_report = config_options.Optional(config_options.Type(str))
+    """A JSON or Markdown file to write the timings report to, relative to the configuration file."""
+    timings_top = config_options.Type(int, default=10)
+    """The number of slowest code blocks to log."""
+    output_limit = config_options.Optional(config_options.Type(int))
+    """The maximum size of the output of Python code blocks, in bytes."""
+    output_truncate = config_options.Choice(("head", "tail"), default="head")
+    """Which part of the output of Python code blocks to keep when it exceeds the limit."""
+    session_scope = config_options.Choice(("page", "build", "global"), default="global")
+    """When to release the state of sessions: at the end of each page, of each build, or never."""
+    session_sizes = config_options.Type(bool, default=False)
+    """Whether to log the approximate memory retained by each Python session when its scope ends."""
+    tree_icons = config_options.DictOfItems(config_options.Type(str), default={})
+    """Icons of files in tree code blocks, by file name or extension (`*.ext`), like `:simple-python:`."""
+    pyodide_load = config_options.Choice(("eager", "lazy"), default="eager")
+    """When to load Pyodide in pages with Pyodide editors: right away, or once an editor is focused or visible."""
+    python_workers = config_options.Type(int, default=0)
+    """The number of worker processes executing Python code blocks (zero to execute them in the main process)."""
+    python_preload = config_options.ListOfItems(config_options.Type(str), default=[])
+    """Modules to import in Python worker processes before they execute code blocks."""
 
 
 class MarkdownExecPlugin(BasePlugin[MarkdownExecPluginConfig]):
     """MkDocs plugin to easily enable custom fences for code blocks execution."""
 
+    _serving: bool = False
+
+    def on_startup(self, *, command: str, dirty: bool) -> None:  # noqa: ARG002
+        """Remember whether the documentation is being served.
+
+        Hook for the [`on_startup` event](https://www.mkdocs.org/user-guide/plugins/#on_startup).
+
+        Arguments:
+            command: The MkDocs command being run.
+            dirty: Whether the build is dirty.
+        """
+        self._serving = command == "serve"
+
     def on_config(self, config: MkDocsConfig) -> MkDocsConfig | None:
         """Configure the plugin.
 
@@ -90,7 +161,20 @@ class MarkdownExecPlugin(BasePlugin[MarkdownExecPluginConfig]):
             )
         self.mkdocs_config_dir = os.getenv("MKDOCS_CONFIG_DIR")
         os.environ["MKDOCS_CONFIG_DIR"] = os.path.dirname(config["config_file_path"])  # noqa: PTH120
+        self.markdown_exec_variables = {name: os.getenv(name) for name in _plugin_variables.values()}
+        for option, name in _plugin_variables.items():
+            if self.config[option] is not None:
+                os.environ[name] = str(self.config[option])
         self.languages = self.config.languages
+        if self.config.python_workers != _python_workers.size or self.config.python_preload != _python_workers.preload:
+            _python_workers.configure(self.config.python_workers, self.config.python_preload)
+        _execution_cache.keep_in_memory(self._serving and self.config.incremental)
+        _execution_cache.checkpoints = self.config.checkpoints
+        _custom_icons.clear()
+        _custom_icons.update(self.config.tree_icons)
+        _execution_timings.enabled = self.config.timings or self.config.timings_report is not None
+        if self.config.cache:
+            _execution_cache.configure(os.path.join(os.environ["MKDOCS_CONFIG_DIR"], self.config.cache_dir))  # noqa: PTH118
         mdx_configs = config.setdefault("mdx_configs", {})
         superfences = mdx_configs.setdefault("pymdownx.superfences", {})
         custom_fences = superfences.setdefault("custom_fences", [])
@@ -106,6 +190,30 @@ class MarkdownExecPlugin(BasePlugin[MarkdownExecPluginConfig]):
         markdown_config.save(config.markdown_extensions, config.mdx_configs)
         return config
 
+    def on_files(self, files: Files, *, config: MkDocsConfig) -> Files | None:  # noqa: ARG002
+        """Execute independent code blocks ahead of rendering.
+
+        Hook for the [`on_files` event](https://www.mkdocs.org/user-guide/plugins/#on_files).
+        When the `parallel` option is enabled, we scan every page for code blocks
+        that do not use a session, and execute them in a pool of processes.
+        Their output is then served when the pages are rendered.
+
+        Arguments:
+            files: The files collection.
+            config: The MkDocs config object.
+
+        Returns:
+            The files collection.
+        """
+        if self.config.parallel:
+            _parallel_executor.start(self.config.max_workers)
+            submitted = sum(
+                _parallel_executor.submit_page(file.content_string, self.languages)
+                for file in files.documentation_pages()
+            )
+            _logger.debug("Submitted %d code blocks for parallel execution", submitted)
+        return files
+
     def on_env(
         self,
         env: Environment,
@@ -121,14 +229,94 @@ class MarkdownExecPlugin(BasePlugin[MarkdownExecPluginConfig]):
             self._add_js(config, "pyodide.js")
         return env
 
+    def on_page_markdown(self, markdown: str, *, page: Page, config: MkDocsConfig, files: Files) -> str | None:  # noqa: ARG002
+        """Record which page is being rendered.
+
+        Hook for the [`on_page_markdown` event](https://www.mkdocs.org/user-guide/plugins/#on_page_markdown).
+
+        Arguments:
+            markdown: The page Markdown contents.
+            page: The page object.
+            config: The MkDocs config object.
+            files: The files collection.
+
+        Returns:
+            The unchanged Markdown contents.
+        """
+        _execution_cache.page = page.file.src_uri
+        return markdown
+
+    def on_page_content(self, html: str, *, page: Page, config: MkDocsConfig, files: Files) -> str | None:  # noqa: ARG002
+        """Release sessions scoped to the page.
+
+        Hook for the [`on_page_content` event](https://www.mkdocs.org/user-guide/plugins/#on_page_content).
+
+        Arguments:
+            html: The page HTML contents.
+            page: The page object.
+            config: The MkDocs config object.
+            files: The files collection.
+
+        Returns:
+            The unchanged HTML contents.
+        """
+        if self.config.session_scope == "page":
+            self._release_sessions(page.file.src_uri)
+        return html
+
     def on_post_build(self, *, config: MkDocsConfig) -> None:  # noqa: ARG002
         """Reset the plugin state."""
+        if self._serving and self.config.incremental:
+            executed = {page: count for page, count in _execution_cache.executed.items() if page}
+            if executed:
+                details = ", ".join(f"{page} ({count})" for page, count in executed.items())
+                _logger.info(f"Executed {sum(executed.values())} new or changed code blocks: {details}")
+        if _execution_timings.enabled and _execution_timings.records:
+            if self.config.timings:
+                _logger.info(_execution_timings.summary(self.config.timings_top))
+            if self.config.timings_report:
+                _execution_timings.write_report(
+                    os.path.join(os.environ["MKDOCS_CONFIG_DIR"], self.config.timings_report),  # noqa: PTH118
+                )
+        _execution_timings.reset()
         MarkdownConverter.counter = 0
+        _execution_cache.reset()
+        _parallel_executor.shutdown()
+        if self.config.session_scope == "global":
+            # Session blocks get new modules at each build: only keep the ones still used by session variables.
+            _purge_unused_sessions_code_blocks()
+            self._report_session_sizes("end of build")
+        else:
+            self._release_sessions("end of build")
         markdown_config.reset()
         if self.mkdocs_config_dir is None:
             os.environ.pop("MKDOCS_CONFIG_DIR", None)
         else:
             os.environ["MKDOCS_CONFIG_DIR"] = self.mkdocs_config_dir
+        for name, value in self.markdown_exec_variables.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    def on_shutdown(self) -> None:
+        """Stop the Python worker processes and shell sessions."""
+        _python_workers.stop()
+        _close_shell_sessions()
+
+    def _report_session_sizes(self, when: str) -> None:
+        if self.config.session_sizes:
+            for session, state in python_state(sizes=True).items():
+                _logger.info(
+                    f"Python session '{session}' retains ~{state['size'] / 1024:.1f} KiB "
+                    f"in {state['globals']} variables ({when})",
+                )
+
+    def _release_sessions(self, when: str) -> None:
+        self._report_session_sizes(when)
+        purge_python_state()
+        _close_shell_sessions()
+        _execution_cache.reset_sessions()
 
     def _add_asset(self, config: MkDocsConfig, asset_file: str, asset_type: str) -> None:
         asset_filename = f"assets/_markdown_exec_{asset_file}"
@@ -0,0 +1,149 @@
+# Parallel execution of independent code blocks, ahead of rendering.
+
+from __future__ import annotations
+
+import re
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Any
+
+from markdown.util import ETX, STX
+from pymdownx.superfences import RE_NESTED_FENCE_START, RE_OPTIONS
+
+from markdown_exec._internal.cache import _execution_cache, _execution_data, _hash
+from markdown_exec._internal.formatters import bash, console, pycon, python, sh
+from markdown_exec._internal.formatters.base import ExecutionError, console_width, working_directory
+from markdown_exec._internal.logger import get_logger
+from markdown_exec._internal.main import validator
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+_logger = get_logger(__name__)
+
+# Languages that can be executed ahead of rendering,
+# with the language, run function and source transformation used by their formatter.
+_runners: dict[str, tuple[str, Callable[..., str], Callable[[str], tuple[str, str]] | None]] = {
+    "bash": ("bash", bash._run_bash, None),
+    "console": ("console", sh._run_sh, console._transform_source),
+    "py": ("python", python._run_python, None),
+    "python": ("python", python._run_python, None),
+    "pycon": ("pycon", python._run_python, pycon._transform_source),
+    "sh": ("sh", sh._run_sh, None),
+}
+
+_leading_ws_re = re.compile(r"[ \t]*")
+_blank_line_re = re.compile(r"(?<=\n) +\n")
+
+
+def _normalize(markdown: str, tab_length: int = 4) -> str:
+    # Same as Python-Markdown's `NormalizeWhitespace` preprocessor,
+    # so that code blocks hash the same as when they are rendered.
+    markdown = markdown.replace(STX, "").replace(ETX, "")
+    markdown = markdown.replace("\r\n", "\n").replace("\r", "\n").expandtabs(tab_length)
+    return _blank_line_re.sub("\n", markdown)
+
+
+def _scan_blocks(markdown: str) -> Iterator[tuple[str, str, dict[str, str]]]:
+    # Yield the language, code and inputs of every fenced code block,
+    # following what SuperFences does (options syntax only, no attribute lists).
+    lines = _normalize(markdown).split("\n")
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        indent = _leading_ws_re.match(line).group()  # ty:ignore[possibly-missing-attribute]
+        match = RE_NESTED_FENCE_START.match(line, len(indent))
+        index += 1
+        if not match or not match.group("lang") or match.group("attrs") or match.group("unrecognized"):
+            continue
+        fence = match.group("fence")
+        code = []
+        while index < len(lines):
+            content_line = lines[index]
+            index += 1
+            if content_line.strip() == fence:
+                if content_line.startswith(indent + fence):
+                    inputs = {
+                        option.group("key"): option.group("value") or option.group("key")
+                        for option in RE_OPTIONS.finditer(match.group("options") or "")
+                    }
+                    yield match.group("lang"), "\n".join(code), inputs
+                break
+            code.append(content_line[len(indent) :])
+
+
+def _execute(language: str, code: str, options: dict[str, Any]) -> str:
+    # Runs in a worker process.
+    _, run, _ = _runners[language]
+    with working_directory(options["workdir"]), console_width(options["width"]):
+        return run(
+            code,
+            returncode=options["returncode"],
+            session=None,
+            id=options["id"],
+            timeout=options["timeout"],
+            **options["extra"],
+        )
+
+
+class _ParallelExecutor:
+    def __init__(self) -> None:
+        self._pool: ProcessPoolExecutor | None = None
+        self._submitted: set[str] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._pool is not None
+
+    def start(self, max_workers: int | None = None) -> None:
+        self.shutdown()
+        self._pool = ProcessPoolExecutor(max_workers=max_workers)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._submitted.clear()
+
+    def submit_page(self, markdown: str, languages: list[str]) -> int:
+        submitted = 0
+        for language, code, inputs in _scan_blocks(markdown):
+            if language in languages and language in _runners and self._submit(language, code, inputs):
+                submitted += 1
+        return submitted
+
+    def _submit(self, language: str, code: str, inputs: dict[str, str]) -> bool:
+        if self._pool is None:
+            return False
+        options: dict[str, Any] = {}
+        try:
+            valid = validator(language, inputs, options, {}, None)  # ty:ignore[invalid-argument-type]
+        except ValueError:
+            return False
+        if not valid or options["session"] or not options["cache"]:
+            return False
+        base_language, run, transform_source = _runners[language]
+        if transform_source:
+            code, _ = transform_source(code)
+        data = _execution_data(run, base_language, code, **options)
+        key = _hash(data)
+        if key in self._submitted or _execution_cache.contains(data):
+            return False
+        self._submitted.add(key)
+        future = self._pool.submit(_execute, language, code, options)
+        _execution_cache.prefetch(data, partial(_resolve, future))
+        return True
+
+
+def _resolve(future: Future, run: Callable[[], str]) -> str:
+    try:
+        return future.result()
+    except ExecutionError:
+        raise
+    except Exception as error:  # noqa: BLE001
+        # The worker died or the block could not be sent to it, run it here instead.
+        _logger.debug("Parallel execution of code block failed: %s", error)
+        return run()
+
+
+_parallel_executor = _ParallelExecutor()
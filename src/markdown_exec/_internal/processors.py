@@ -9,13 +9,44 @@ from typing import TYPE_CHECKING
 from xml.etree.ElementTree import Element
 
 from markdown.treeprocessors import Treeprocessor
-from markdown.util import HTML_PLACEHOLDER_RE
+from markdown.util import HTML_PLACEHOLDER_RE, STX
 
 if TYPE_CHECKING:
     from markdown import Markdown
     from markupsafe import Markup
 
 
+_heading_tags = frozenset(f"{h}{level}" for h in "hH" for level in range(1, 7))
+
+
+def _prefix_ids(el: Element, id_prefix: str) -> None:
+    id_attr = el.get("id")
+    if id_attr:
+        el.set("id", id_prefix + id_attr)
+
+    href_attr = el.get("href")
+    if href_attr and href_attr.startswith("#"):
+        el.set("href", "#" + id_prefix + href_attr[1:])
+
+    name_attr = el.get("name")
+    if name_attr:
+        el.set("name", id_prefix + name_attr)
+
+    if el.tag == "label":
+        for_attr = el.get("for")
+        if for_attr:
+            el.set("for", id_prefix + for_attr)
+
+
+def _heading_stub(md: Markdown, el: Element) -> Element:
+    el = copy.copy(el)
+    # 'toc' extension's first pass (which we require to build heading stubs/ids) also edits the HTML.
+    # Undo the permalink edit so we can pass this heading to the outer pass of the 'toc' extension.
+    if len(el) > 0 and el[-1].get("class") == md.treeprocessors["toc"].permalink_class:  # type: ignore[attr-defined]
+        del el[-1]
+    return el
+
+
 # code taken from mkdocstrings, credits to @oprypin
 class IdPrependingTreeprocessor(Treeprocessor):
     """Prepend the configured prefix to IDs of all HTML elements."""
@@ -33,22 +64,7 @@ class IdPrependingTreeprocessor(Treeprocessor):
         if not self.id_prefix:
             return
         for el in root.iter():
-            id_attr = el.get("id")
-            if id_attr:
-                el.set("id", self.id_prefix + id_attr)
-
-            href_attr = el.get("href")
-            if href_attr and href_attr.startswith("#"):
-                el.set("href", "#" + self.id_prefix + href_attr[1:])
-
-            name_attr = el.get("name")
-            if name_attr:
-                el.set("name", self.id_prefix + name_attr)
-
-            if el.tag == "label":
-                for_attr = el.get("for")
-                if for_attr:
-                    el.set("for", self.id_prefix + for_attr)
+            _prefix_ids(el, self.id_prefix)
 
 
 # code taken from mkdocstrings, credits to @oprypin
@@ -69,12 +85,55 @@ class HeadingReportingTreeprocessor(Treeprocessor):
         """Run the treeprocessor."""
         for el in root.iter():
             if self.regex.fullmatch(el.tag):
-                el = copy.copy(el)  # noqa: PLW2901
-                # 'toc' extension's first pass (which we require to build heading stubs/ids) also edits the HTML.
-                # Undo the permalink edit so we can pass this heading to the outer pass of the 'toc' extension.
-                if len(el) > 0 and el[-1].get("class") == self.md.treeprocessors["toc"].permalink_class:  # type: ignore[attr-defined]
-                    del el[-1]
-                self.headings.append(el)
+                self.headings.append(_heading_stub(self.md, el))
+
+
+class _IdsAndHeadingsTreeprocessor(Treeprocessor):
+    # Combination of the two processors above, walking the tree only once.
+
+    name = "markdown_exec_ids_and_headings"
+
+    def __init__(self, md: Markdown, id_prefix: str = "", headings: list[Element] | None = None) -> None:
+        super().__init__(md)
+        # The prefix to prepend to IDs, and the list of heading elements (none to disable reporting).
+        self.id_prefix = id_prefix
+        self.headings = headings
+        # Heading elements found in the current document, turned into stubs by `_HeadingStubsTreeprocessor`.
+        self.found: list[Element] = []
+
+    def run(self, root: Element) -> None:
+        self.found = []
+        id_prefix = self.id_prefix
+        record = self.headings is not None
+        if not id_prefix and not record:
+            return
+        # Most elements (paragraphs, table cells, spans) have no attributes and are not headings:
+        # collect the few others first, and stop there when there are none.
+        elements = [el for el in root.iter() if el.attrib or el.tag in _heading_tags]
+        if not elements:
+            return
+        for el in elements:
+            if id_prefix and el.attrib:
+                _prefix_ids(el, id_prefix)
+            if record and el.tag in _heading_tags:
+                self.found.append(el)
+
+
+class _HeadingStubsTreeprocessor(Treeprocessor):
+    # Headings are found while prefixing IDs, right after 'toc', but like `HeadingReportingTreeprocessor`,
+    # we record them close to the end, so that changes made by other treeprocessors are included.
+
+    name = "markdown_exec_heading_stubs"
+
+    def __init__(self, md: Markdown, finder: _IdsAndHeadingsTreeprocessor) -> None:
+        super().__init__(md)
+        self.finder = finder
+
+    def run(self, root: Element) -> None:  # noqa: ARG002
+        finder = self.finder
+        if finder.headings is not None:
+            finder.headings.extend(_heading_stub(self.md, el) for el in finder.found)
+        finder.found = []
 
 
 class InsertHeadings(Treeprocessor):
@@ -92,21 +151,36 @@ class InsertHeadings(Treeprocessor):
         super().__init__(md)
         self.headings: dict[Markup, list[Element]] = {}
         """The dictionary of headings."""
+        # Containers inserted in the current document, and their parents, for `RemoveHeadings`.
+        self._containers: list[tuple[Element, Element]] = []
 
     def run(self, root: Element) -> None:
         """Run the treeprocessor."""
+        self._containers = []
         if not self.headings:
             return
 
+        # Find the stash indices of our outputs first: there are far less stashed blocks than elements.
+        wanted: dict[int, list[Element]] = {}
+        for index, block in enumerate(self.md.htmlStash.rawHtmlBlocks):
+            if isinstance(block, str) and (headings := self.headings.get(block)):  # ty:ignore[invalid-argument-type]
+                wanted[index] = headings
+        if not wanted:
+            return
+
         for el in root.iter():
-            match = HTML_PLACEHOLDER_RE.match(el.text or "")
-            if match:
-                counter = int(match.group(1))
-                markup: Markup = self.md.htmlStash.rawHtmlBlocks[counter]  # ty:ignore[invalid-assignment]
-                if headings := self.headings.get(markup):
-                    div = Element("div", {"class": "markdown-exec"})
-                    div.extend(headings)
-                    el.append(div)
+            text = el.text
+            # Cheap check before matching the regex, most elements are not placeholders.
+            if not text or text[0] != STX:
+                continue
+            match = HTML_PLACEHOLDER_RE.match(text)
+            if match and (headings := wanted.pop(int(match.group(1)), None)):
+                div = Element("div", {"class": "markdown-exec"})
+                div.extend(headings)
+                el.append(div)
+                self._containers.append((el, div))
+                if not wanted:
+                    break
 
 
 class RemoveHeadings(Treeprocessor):
@@ -117,20 +191,47 @@ class RemoveHeadings(Treeprocessor):
 
     def run(self, root: Element) -> None:
         """Run the treeprocessor."""
-        self._remove_duplicated_headings(root)
-
-    def _remove_duplicated_headings(self, parent: Element) -> None:
-        carry_text = ""
-        for el in reversed(parent):  # Reversed mainly for the ability to mutate during iteration.
-            if el.tag == "div" and el.get("class") == "markdown-exec":
+        if InsertHeadings.name not in self.md.treeprocessors:
+            self._remove_duplicated_headings(root)
+            return
+        # Only remove the containers our headings insertor created, without walking the whole tree.
+        insert_headings: InsertHeadings = self.md.treeprocessors[InsertHeadings.name]  # ty:ignore[invalid-assignment]
+        containers, insert_headings._containers = insert_headings._containers, []
+        for parent, container in containers:
+            if not self._remove_container(parent, container):
+                # The tree was restructured since the containers were inserted.
+                self._remove_duplicated_headings(root)
+                return
+
+    def _remove_container(self, parent: Element, container: Element) -> bool:
+        for index, el in enumerate(parent):
+            if el is container:
                 # Delete the duplicated headings along with their container, but keep the text (i.e. the actual HTML).
-                carry_text = (el.text or "") + carry_text
-                parent.remove(el)
-            else:
-                if carry_text:
-                    el.tail = (el.tail or "") + carry_text
-                    carry_text = ""
-                self._remove_duplicated_headings(el)
-
-        if carry_text:
-            parent.text = (parent.text or "") + carry_text
+                if container.text:
+                    if index:
+                        parent[index - 1].tail = (parent[index - 1].tail or "") + container.text
+                    else:
+                        parent.text = (parent.text or "") + container.text
+                del parent[index]
+                return True
+        return False
+
+    def _remove_duplicated_headings(self, root: Element) -> None:
+        # Iterative, to support deeply nested documents.
+        parents = [root]
+        while parents:
+            parent = parents.pop()
+            carry_text = ""
+            for el in reversed(parent):  # Reversed mainly for the ability to mutate during iteration.
+                if el.tag == "div" and el.get("class") == "markdown-exec":
+                    # Delete the duplicated headings along with their container, but keep the text.
+                    carry_text = (el.text or "") + carry_text
+                    parent.remove(el)
+                else:
+                    if carry_text:
+                        el.tail = (el.tail or "") + carry_text
+                        carry_text = ""
+                    parents.append(el)
+
+            if carry_text:
+                parent.text = (parent.text or "") + carry_text
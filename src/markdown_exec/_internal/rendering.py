@@ -12,10 +12,10 @@ from markdown import Markdown
 from markupsafe import Markup
 
 from markdown_exec._internal.processors import (
-    HeadingReportingTreeprocessor,
-    IdPrependingTreeprocessor,
     InsertHeadings,
     RemoveHeadings,
+    _HeadingStubsTreeprocessor,
+    _IdsAndHeadingsTreeprocessor,
 )
 
 if TYPE_CHECKING:
@@ -148,11 +148,13 @@ class MarkdownConfig:
         """
         self.exts = exts
         self.exts_config = exts_config
+        _md_pool.clear()
 
     def reset(self) -> None:
         """Reset Markdown extensions and their configuration."""
         self.exts = None
         self.exts_config = None
+        _md_pool.clear()
 
 
 markdown_config = MarkdownConfig()
@@ -208,28 +210,57 @@ def _mimic(md: Markdown, headings: list[Element], *, update_toc: bool = True) ->
         extensions.append("md_in_html")
 
     new_md.registerExtensions(extensions, extensions_config)
+    if update_toc:
+        _register_headings_processors(md)
+    # IDs are prefixed and headings found in a single walk of the tree.
+    ids_and_headings = _IdsAndHeadingsTreeprocessor(new_md, "", headings if update_toc else None)
     new_md.treeprocessors.register(
-        IdPrependingTreeprocessor(md, ""),
-        IdPrependingTreeprocessor.name,
+        ids_and_headings,
+        _IdsAndHeadingsTreeprocessor.name,
         priority=4,  # right after 'toc' (needed because that extension adds ids to headings)
     )
-    new_md._original_md = md  # ty:ignore[unresolved-attribute]
-
     if update_toc:
-        _register_headings_processors(md)
         new_md.treeprocessors.register(
-            HeadingReportingTreeprocessor(new_md, headings),
-            HeadingReportingTreeprocessor.name,
+            _HeadingStubsTreeprocessor(new_md, ids_and_headings),
+            _HeadingStubsTreeprocessor.name,
             priority=1,  # Close to the end.
         )
+    new_md._original_md = md  # ty:ignore[unresolved-attribute]
 
     return new_md
 
 
+# Secondary Markdown instances are expensive to build (extensions are imported and instantiated),
+# so we keep idle ones around, per original Markdown instance, and reset them before reuse.
+_md_pool: dict[tuple[Markdown, bool], list[Markdown]] = {}
+_md_pool_size = 16
+
+
+@contextmanager
+def _pooled_md(md: Markdown, headings: list[Element], *, update_toc: bool = True) -> Iterator[Markdown]:
+    key = (md, update_toc)
+    if (idle := _md_pool.get(key)) is None:
+        if len(_md_pool) >= _md_pool_size:
+            # Drop instances of the least recently added Markdown instance (previous pages for example).
+            del _md_pool[next(iter(_md_pool))]
+        idle = _md_pool[key] = []
+    if idle:
+        new_md = idle.pop()
+        if update_toc:
+            new_md.treeprocessors[_IdsAndHeadingsTreeprocessor.name].headings = headings  # type: ignore[attr-defined]
+    else:
+        new_md = _mimic(md, headings, update_toc=update_toc)
+    try:
+        yield new_md
+    finally:
+        new_md.reset()
+        idle.append(new_md)
+
+
 @contextmanager
 def _id_prefix(md: Markdown, prefix: str | None) -> Iterator[None]:
     MarkdownConverter.counter += 1
-    id_prepending_processor = md.treeprocessors[IdPrependingTreeprocessor.name]
+    id_prepending_processor = md.treeprocessors[_IdsAndHeadingsTreeprocessor.name]
     id_prepending_processor.id_prefix = prefix if prefix is not None else f"exec-{MarkdownConverter.counter}--"  # type: ignore[attr-defined]
     try:
         yield
@@ -266,10 +297,11 @@ class MarkdownConverter:
         Returns:
             Safe HTML.
         """
-        md = _mimic(self._original_md, self._headings, update_toc=self._update_toc)
-
         # convert markdown to html
-        with _id_prefix(md, id_prefix):
+        with (
+            _pooled_md(self._original_md, self._headings, update_toc=self._update_toc) as md,
+            _id_prefix(md, id_prefix),
+        ):
             converted = md.convert(text)
 
         # restore html from stash
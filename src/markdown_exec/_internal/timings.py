@@ -0,0 +1,136 @@
+# Timing of executed code blocks, to find the slowest ones.
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+@dataclass
+class _BlockTiming:
+    """Dataclass describing the execution of a code block."""
+
+    page: str | None
+    """Page containing the code block."""
+    language: str
+    """Language of the code block."""
+    identifier: str
+    """ID or title of the code block."""
+    session: str | None
+    """Session of the code block."""
+    wall_time: float = 0.0
+    """Elapsed time, in seconds."""
+    cpu_time: float | None = 0.0
+    """CPU time of the process and its waited-for children, in seconds, or None if the code ran elsewhere."""
+    output_size: int = 0
+    """Size of the output, in characters."""
+    cache_status: str = ""
+    """Whether the output was served from the cache, computed in parallel, etc."""
+    error: bool = False
+    """Whether the execution failed."""
+
+
+def _cpu_time() -> float:
+    # Children times include shell processes, once they have been waited for.
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class _ExecutionTimings:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.records: list[_BlockTiming] = []
+        self._current: _BlockTiming | None = None
+
+    def reset(self) -> None:
+        self.records.clear()
+
+    @contextmanager
+    def measure(self, page: str | None, language: str, identifier: str, session: str | None) -> Iterator[_BlockTiming]:
+        timing = _BlockTiming(page=page, language=language, identifier=identifier, session=session)
+        if not self.enabled:
+            yield timing
+            return
+        wall_start, cpu_start = time.perf_counter(), _cpu_time()
+        self._current = timing
+        try:
+            yield timing
+        except BaseException:
+            timing.error = True
+            raise
+        finally:
+            self._current = None
+            timing.wall_time = time.perf_counter() - wall_start
+            if timing.cpu_time is not None:
+                timing.cpu_time = _cpu_time() - cpu_start
+            self.records.append(timing)
+
+    def ran_elsewhere(self) -> None:
+        # Code running in a session shell or a Python worker doesn't show in our CPU times:
+        # report them as unavailable rather than zero.
+        if self._current is not None:
+            self._current.cpu_time = None
+
+    def sorted_records(self) -> list[_BlockTiming]:
+        return sorted(self.records, key=lambda timing: timing.wall_time, reverse=True)
+
+    def summary(self, top: int) -> str:
+        total = sum(timing.wall_time for timing in self.records)
+        lines = [f"Executed {len(self.records)} code blocks in {total:.2f}s, slowest ones:"]
+        cumulated = 0.0
+        for timing in self.sorted_records()[:top]:
+            cumulated += timing.wall_time
+            share = cumulated / total * 100 if total else 100.0
+            description = f"{_describe(timing)} in {timing.page or '?'}"
+            lines.append(f"  {timing.wall_time:8.3f}s ({share:5.1f}% cumulated)  {description}")
+        return "\n".join(lines)
+
+    def write_report(self, path: str | Path) -> None:
+        path = Path(path)
+        records = self.sorted_records()
+        if path.suffix == ".json":
+            data = {
+                "total_wall_time": sum(timing.wall_time for timing in records),
+                "total_cpu_time": sum(timing.cpu_time for timing in records if timing.cpu_time is not None),
+                "blocks": [asdict(timing) for timing in records],
+            }
+            contents = json.dumps(data, indent=2)
+        else:
+            lines = [
+                "| Wall time (s) | CPU time (s) | Output size | Cache | Page | Code block |",
+                "| ---: | ---: | ---: | --- | --- | --- |",
+            ]
+            lines.extend(
+                f"| {timing.wall_time:.3f} | {_format_cpu_time(timing)} | {timing.output_size} | {timing.cache_status} "
+                f"| {timing.page or ''} | {_describe(timing)} |"
+                for timing in records
+            )
+            contents = "\n".join(lines)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(contents + "\n", encoding="utf8")
+
+
+def _format_cpu_time(timing: _BlockTiming) -> str:
+    return "n/a" if timing.cpu_time is None else f"{timing.cpu_time:.3f}"
+
+
+def _describe(timing: _BlockTiming) -> str:
+    description = timing.language
+    if timing.identifier:
+        description += f" '{timing.identifier}'"
+    if timing.session:
+        description += f" (session {timing.session})"
+    if timing.error:
+        description += " [failed]"
+    return description
+
+
+_execution_timings = _ExecutionTimings()
@@ -38,6 +38,66 @@ async function initPyodide() {
     }
 }
 
+var pyodidePromise = null;
+
+function getPyodide() {
+    // Pyodide is loaded once per page, by the first editor needing it.
+    if (pyodidePromise === null) {
+        pyodidePromise = initPyodide();
+    }
+    return pyodidePromise;
+}
+
+var installPromise = null;
+
+function getPagePackages(install) {
+    // Packages to install for every editor of the page.
+    const packages = new Set(install);
+    for (const element of document.querySelectorAll(".pyodide[data-install]")) {
+        for (const name of element.dataset.install.split(",")) {
+            if (name.trim()) packages.add(name.trim());
+        }
+    }
+    return [...packages];
+}
+
+async function installPackages(pyodide, install) {
+    // Packages of all editors are installed in a single batch, shared by editors.
+    // If the batch fails, each editor installs its own packages instead,
+    // so that only editors needing a failing package report an error.
+    const micropip = pyodide.pyimport("micropip");
+    if (installPromise === null) {
+        installPromise = micropip.install(pyodide.toPy(getPagePackages(install))).then(
+            () => true,
+            (error) => {
+                console.warn("Could not install packages of the page, installing them per editor:", error);
+                return false;
+            },
+        );
+    }
+    if (!(await installPromise)) {
+        await micropip.install(pyodide.toPy(install));
+    }
+}
+
+function whenNeeded(editor, container, run) {
+    // Resolve when the editor is focused, scrolled into view or run,
+    // so that Pyodide is only downloaded if readers might use it.
+    return new Promise((resolve) => {
+        editor.on("focus", resolve);
+        run.addEventListener("click", resolve, { once: true });
+        if ("IntersectionObserver" in window) {
+            const observer = new IntersectionObserver((entries) => {
+                if (entries.some((entry) => entry.isIntersecting)) {
+                    observer.disconnect();
+                    resolve();
+                }
+            });
+            observer.observe(container);
+        }
+    });
+}
+
 function getTheme() {
     return document.body.getAttribute('data-md-color-scheme');
 }
@@ -85,6 +145,7 @@ async function setupPyodide(
     session = null,
     minLines = 5,
     maxLines = 30,
+    lazy = false,
 ) {
     const editor = ace.edit(idPrefix + "editor");
     const run = document.getElementById(idPrefix + "run");
@@ -102,13 +163,20 @@ async function setupPyodide(
     // Force editor to resize after setting options
     editor.resize();
 
+    const container = output.parentElement.parentElement;
+    let runRequested = false;
+    if (lazy) {
+        // Remember clicks on Run until Pyodide is ready.
+        run.onclick = () => { runRequested = true; };
+        await whenNeeded(editor, container, run);
+    }
+
+    clearOutput(output);
     writeOutput(output, "Initializing...");
-    let pyodide = await pyodidePromise;
+    let pyodide = await getPyodide();
     if (install && install.length) {
         try {
-            micropip = pyodide.pyimport("micropip");
-            for (const package of install)
-                await micropip.install(package);
+            await installPackages(pyodide, install);
             clearOutput(output);
         } catch (error) {
             clearOutput(output);
@@ -120,12 +188,14 @@ async function setupPyodide(
     }
     run.onclick = () => evaluatePython(pyodide, editor, output, session);
     clear.onclick = () => clearOutput(output);
-    output.parentElement.parentElement.addEventListener("keydown", (event) => {
+    container.addEventListener("keydown", (event) => {
         if (event.ctrlKey && event.key.toLowerCase() === 'enter') {
             event.preventDefault();
             run.click();
         }
     });
+    if (runRequested) run.click();
 }
 
-var pyodidePromise = initPyodide();
+// Start loading Pyodide right away if some editors are not lazy, like before editors are set up.
+if (document.querySelector('.pyodide:not([data-load="lazy"])')) getPyodide();
@@ -106,6 +106,11 @@ def test_exposed_objects(modulelevel_internal_objects: list[griffe.Object | grif
     assert not not_exposed, "Objects not exposed:\n" + "\n".join(sorted(not_exposed))
 
 
+def test_listed_names() -> None:
+    """Only the public API is listed by `dir()`."""
+    assert dir(markdown_exec) == sorted(markdown_exec.__all__)
+
+
 def test_unique_names(modulelevel_internal_objects: list[griffe.Object | griffe.Alias]) -> None:
     """All internal objects have unique names."""
     names_to_paths = defaultdict(list)
@@ -26,6 +26,20 @@ def test_no_p_around_html(md: Markdown) -> None:
     assert html == code
 
 
+def test_run_functions_without_new_options(md: Markdown) -> None:
+    """Assert run functions not accepting the timeout, workdir and width options still work.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+
+    def run(code: str, returncode: int, session: str | None, id: str) -> str:  # noqa: A002,ARG001
+        return code.upper()
+
+    html = base_format(language="whatever", run=run, code="hello", md=md)
+    assert html == "<p>HELLO</p>"
+
+
 @pytest.mark.parametrize("html", [True, False])
 def test_render_source(md: Markdown, html: bool) -> None:
     """Assert source is rendered.
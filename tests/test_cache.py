@@ -0,0 +1,253 @@
+"""Tests for the execution cache."""
+
+from __future__ import annotations
+
+import pickle
+from textwrap import dedent
+from typing import TYPE_CHECKING
+
+import pytest
+
+from markdown_exec._internal.cache import _execution_cache
+from markdown_exec._internal.formatters.python import _sessions_globals, _snapshot_session
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from markdown import Markdown
+
+
+class _Counter:
+    # Counts the executions of the code blocks it is added to.
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    @property
+    def code(self) -> str:
+        # A single line, so that it can be inserted in indented templates.
+        return (
+            f"import pathlib; counter = pathlib.Path({str(self.path)!r}); "
+            'counter.write_text(counter.read_text(encoding="utf8") + "x" if counter.exists() else "x", encoding="utf8")'
+        )
+
+    @property
+    def count(self) -> int:
+        return len(self.path.read_text(encoding="utf8")) if self.path.exists() else 0
+
+
+@pytest.fixture
+def counter(tmp_path: Path) -> _Counter:
+    """Return a counter of executions.
+
+    Parameters:
+        tmp_path: A temporary directory (fixture).
+
+    Returns:
+        A counter of executions.
+    """
+    return _Counter(tmp_path / "counter.txt")
+
+
+@pytest.fixture(autouse=True)
+def _enable_cache(tmp_path: Path) -> Iterator[None]:
+    _execution_cache.configure(tmp_path)
+    try:
+        yield
+    finally:
+        _execution_cache.configure(None)
+        _execution_cache.reset()
+
+
+def test_unchanged_blocks_are_not_executed_again(md: Markdown, counter: _Counter) -> None:
+    """Assert outputs are read from the cache.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        counter: A counter of executions (fixture).
+    """
+    markdown = dedent(
+        f"""
+        ```python exec="1"
+        {counter.code}
+        print("**executed**")
+        ```
+        """,
+    )
+    assert "<strong>executed</strong>" in md.convert(markdown)
+    md.reset()
+    assert "<strong>executed</strong>" in md.convert(markdown)
+    assert counter.count == 1
+
+
+def test_output_limit_is_part_of_the_key(md: Markdown, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Assert changing the output limit or truncation invalidates cached outputs.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        monkeypatch: A Pytest fixture to patch objects.
+    """
+    markdown = dedent(
+        """
+        ```python exec="1"
+        print("0123456789")
+        ```
+        """,
+    )
+    assert "0123456789" in md.convert(markdown)
+    md.reset()
+    monkeypatch.setenv("MARKDOWN_EXEC_OUTPUT_LIMIT", "4")
+    assert "0123456789" not in md.convert(markdown)
+    md.reset()
+    monkeypatch.setenv("MARKDOWN_EXEC_OUTPUT_TRUNCATE", "tail")
+    html = md.convert(markdown)
+    assert "789" in html
+    assert "0123" not in html
+
+
+def test_opting_out_of_the_cache(md: Markdown, counter: _Counter) -> None:
+    """Assert blocks can opt out of the cache.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        counter: A counter of executions (fixture).
+    """
+    markdown = dedent(
+        f"""
+        ```python exec="1" cache="no"
+        {counter.code}
+        ```
+        """,
+    )
+    md.convert(markdown)
+    md.reset()
+    md.convert(markdown)
+    assert counter.count == 2
+
+
+def test_replaying_cached_session_blocks(md: Markdown) -> None:
+    """Assert cached blocks of a session are replayed before executing a changed block.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    template = dedent(
+        """
+        ```python exec="1" session="cache-replay"
+        value = 40
+        ```
+
+        ```python exec="1" session="cache-replay"
+        print(value + {increment})
+        ```
+        """,
+    )
+    assert "41" in md.convert(template.format(increment=1))
+    _execution_cache.reset()
+    _sessions_globals.pop("cache-replay")
+    md.reset()
+    assert "42" in md.convert(template.format(increment=2))
+
+
+def test_keeping_outputs_in_memory(md: Markdown, counter: _Counter) -> None:
+    """Assert outputs kept in memory are reused, and only executed blocks are counted.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        counter: A counter of executions (fixture).
+    """
+    _execution_cache.configure(None)
+    _execution_cache.keep_in_memory(True)  # noqa: FBT003
+    try:
+        template = dedent(
+            f"""
+            ```python exec="1"
+            {counter.code}
+            ```
+
+            ```python exec="1"
+            print({{value}})
+            ```
+            """,
+        )
+        _execution_cache.page = "page.md"
+        md.convert(template.format(value=1))
+        assert _execution_cache.executed["page.md"] == 2
+        _execution_cache.reset()
+        md.reset()
+        _execution_cache.page = "page.md"
+        assert "2" in md.convert(template.format(value=2))
+        assert _execution_cache.executed["page.md"] == 1
+        assert counter.count == 1
+    finally:
+        _execution_cache.keep_in_memory(False)  # noqa: FBT003
+
+
+def test_restoring_session_checkpoints(md: Markdown, counter: _Counter) -> None:
+    """Assert sessions are restored from checkpoints instead of replaying cached blocks.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        counter: A counter of executions (fixture).
+    """
+    template = dedent(
+        f"""
+        ```python exec="1" session="cache-checkpoint"
+        import math
+        {counter.code}
+        value = 40
+        ```
+
+        ```python exec="1" session="cache-checkpoint"
+        print(math.floor(value + {{increment}}))
+        ```
+        """,
+    )
+    _execution_cache.checkpoints = True
+    try:
+        assert "41" in md.convert(template.format(increment=1))
+        _execution_cache.reset()
+        _sessions_globals.pop("cache-checkpoint")
+        md.reset()
+        assert "42" in md.convert(template.format(increment=2))
+    finally:
+        _execution_cache.checkpoints = False
+    assert counter.count == 1
+
+
+def test_incomplete_session_checkpoints(md: Markdown, counter: _Counter) -> None:
+    """Assert unpicklable globals are skipped in checkpoints, and restoring them falls back to replay.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        counter: A counter of executions (fixture).
+    """
+    template = dedent(
+        f"""
+        ```python exec="1" session="cache-incomplete-checkpoint"
+        import threading
+        {counter.code}
+        lock = threading.Lock()
+        value = 40
+        ```
+
+        ```python exec="1" session="cache-incomplete-checkpoint"
+        with lock:
+            print(value + {{increment}})
+        ```
+        """,
+    )
+    _execution_cache.checkpoints = True
+    try:
+        assert "41" in md.convert(template.format(increment=1))
+        pickled, skipped = pickle.loads(_snapshot_session("cache-incomplete-checkpoint"))  # noqa: S301
+        assert skipped == ["lock"]
+        assert "value" in pickled
+        _execution_cache.reset()
+        _sessions_globals.pop("cache-incomplete-checkpoint")
+        md.reset()
+        assert "42" in md.convert(template.format(increment=2))
+    finally:
+        _execution_cache.checkpoints = False
+    assert counter.count == 2
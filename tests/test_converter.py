@@ -4,12 +4,13 @@ from __future__ import annotations
 
 import re
 from textwrap import dedent
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
 import pytest
 from markdown.extensions.toc import TocExtension
 
 from markdown_exec import MarkdownConfig, markdown_config
+from markdown_exec._internal import rendering
 
 if TYPE_CHECKING:
     from markdown import Markdown
@@ -74,3 +75,67 @@ def test_prefixing_headings(md: Markdown, id: str, id_prefix: str | None, expect
         ),
     )
     assert re.search(expected, html)
+
+
+def test_reusing_secondary_markdown_instances(md: Markdown, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Assert secondary Markdown instances are pooled and reused across conversions.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        monkeypatch: Pytest fixture to patch objects.
+    """
+    mimic_calls = []
+    original_mimic = rendering._mimic
+
+    def mimic(*args: Any, **kwargs: Any) -> Markdown:
+        mimic_calls.append(args)
+        return original_mimic(*args, **kwargs)
+
+    monkeypatch.setattr(rendering, "_mimic", mimic)
+    html = md.convert(
+        dedent(
+            """
+            ```python exec="1"
+            print("**one**")
+            ```
+
+            ```python exec="1"
+            print("**two**")
+            ```
+
+            ````md exec="1"
+            ```python exec="1"
+            print("**three**")
+            ```
+            ````
+            """,
+        ),
+    )
+    assert "<strong>one</strong>" in html
+    assert "<strong>two</strong>" in html
+    assert "<strong>three</strong>" in html
+    # One instance for top-level blocks, and one more for the nested block.
+    assert len(mimic_calls) == 2
+
+
+def test_prefixing_ids_and_reporting_headings_in_one_walk(md: Markdown) -> None:
+    """Assert a single treeprocessor prefixes IDs and reports headings.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    TocExtension().extendMarkdown(md)
+    converter = rendering.MarkdownConverter(md)
+    with rendering._pooled_md(md, []) as new_md:
+        assert "markdown_exec_ids_and_headings" in new_md.treeprocessors
+        assert "markdown_exec_ids" not in new_md.treeprocessors
+        assert "markdown_exec_record_headings" not in new_md.treeprocessors
+
+    html = converter.convert(
+        "## Title\n\n[link](#title)\n\n| a |\n|---|\n| b |",
+        id_prefix="p-",
+    )
+    assert 'id="p-title"' in html
+    assert 'href="#p-title"' in html
+    reported = md.treeprocessors["markdown_exec_insert_headings"].headings[html]  # ty:ignore[unresolved-attribute]
+    assert [heading.get("id") for heading in reported] == ["p-title"]
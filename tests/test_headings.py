@@ -2,8 +2,14 @@
 
 from __future__ import annotations
 
+import sys
 from textwrap import dedent
 from typing import TYPE_CHECKING
+from xml.etree.ElementTree import Element, SubElement
+
+from markupsafe import Markup
+
+from markdown_exec import InsertHeadings, RemoveHeadings
 
 if TYPE_CHECKING:
     from markdown import Markdown
@@ -28,3 +34,59 @@ def test_headings_removal(md: Markdown) -> None:
         ),
     )
     assert 'class="markdown-exec"' not in html
+
+
+def test_inserting_headings_at_stashed_outputs(md: Markdown) -> None:
+    """Headings are inserted where our stashed outputs are, even when nested.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    other = md.htmlStash.store("<p>other</p>")
+    output = Markup("<h2>Output</h2>")
+    placeholder = md.htmlStash.store(output)
+    root = Element("div")
+    SubElement(root, "p").text = other
+    admonition = SubElement(root, "div", {"class": "admonition"})
+    SubElement(admonition, "p").text = "text"
+    paragraph = SubElement(admonition, "p")
+    paragraph.text = placeholder
+    heading = Element("h2", {"id": "output"})
+
+    processor = InsertHeadings(md)
+    processor.headings = {output: [heading]}
+    processor.run(root)
+    container = paragraph.find("div")
+    assert container is not None
+    assert container.get("class") == "markdown-exec"
+    assert list(container) == [heading]
+    assert root[0].find("div") is None
+
+
+def test_removing_moved_heading_containers(md: Markdown) -> None:
+    """Containers moved elsewhere in the tree are still removed, even in deeply nested documents.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    output = Markup("<h2>Output</h2>")
+    placeholder = md.htmlStash.store(output)
+    root = Element("div")
+    paragraph = SubElement(root, "p")
+    paragraph.text = placeholder
+    insert = InsertHeadings(md)
+    insert.headings = {output: [Element("h2")]}
+    md.treeprocessors.register(insert, InsertHeadings.name, priority=75)
+    insert.run(root)
+    assert paragraph.find("div") is not None
+
+    # Move the container deeper than the recursion limit.
+    container = paragraph.find("div")
+    paragraph.remove(container)
+    parent = root
+    for _ in range(sys.getrecursionlimit() + 100):
+        parent = SubElement(parent, "div", {"class": "admonition"})
+    parent.append(container)
+
+    RemoveHeadings(md).run(root)
+    assert not [el for el in root.iter("div") if el.get("class") == "markdown-exec"]
@@ -0,0 +1,141 @@
+"""Tests for the parallel execution of code blocks."""
+
+from __future__ import annotations
+
+import os
+from textwrap import dedent
+from typing import TYPE_CHECKING
+
+import pytest
+
+from markdown_exec._internal.cache import _execution_cache
+from markdown_exec._internal.formatters._python_workers import _python_workers
+from markdown_exec._internal.parallel import _parallel_executor, _scan_blocks
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from markdown import Markdown
+
+
+@pytest.fixture
+def _parallel() -> Iterator[None]:
+    _parallel_executor.start(max_workers=2)
+    try:
+        yield
+    finally:
+        _parallel_executor.shutdown()
+        _execution_cache.reset()
+
+
+def test_scanning_blocks() -> None:
+    """Assert fenced code blocks are found with their options."""
+    blocks = list(
+        _scan_blocks(
+            dedent(
+                """
+                Text.
+
+                ```python exec="1" title="one"
+                print("one")
+                ```
+
+                === "Tab"
+
+                    ```bash exec="yes"
+                    echo two
+                    ```
+
+                ````md exec="1"
+                ```python exec="1"
+                print("nested")
+                ```
+                ````
+                """,
+            ),
+        ),
+    )
+    assert blocks == [
+        ("python", 'print("one")', {"exec": "1", "title": "one"}),
+        ("bash", "echo two", {"exec": "yes"}),
+        ("md", '```python exec="1"\nprint("nested")\n```', {"exec": "1"}),
+    ]
+
+
+@pytest.mark.usefixtures("_parallel")
+def test_serving_results_of_parallel_execution(md: Markdown) -> None:
+    """Assert blocks without sessions are executed in worker processes.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    markdown = dedent(
+        """
+        ```python exec="1"
+        import os
+        print(f"pid: {os.getpid()}")
+        ```
+
+        ```python exec="1" session="parallel"
+        import os
+        print(f"session pid: {os.getpid()}")
+        ```
+        """,
+    )
+    assert _parallel_executor.submit_page(markdown, ["python"]) == 1
+    html = md.convert(markdown)
+    assert f"session pid: {os.getpid()}" in html
+    assert f"<p>pid: {os.getpid()}</p>" not in html
+
+
+@pytest.mark.usefixtures("_parallel")
+def test_using_parallel_results_once(md: Markdown) -> None:
+    """Assert blocks indented with tabs are matched, and identical blocks do not share a prefetched output.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    block = dedent(
+        """
+        ```python exec="1"
+        import os
+        if True:
+        \tprint(f"pid: {os.getpid()}")
+        ```
+        """,
+    )
+    markdown = block + block
+    assert _parallel_executor.submit_page(markdown, ["python"]) == 1
+    html = md.convert(markdown)
+    assert html.count("pid: ") == 2
+    assert html.count(f"pid: {os.getpid()}") == 1
+
+
+@pytest.mark.usefixtures("_parallel")
+def test_parallel_execution_with_python_workers(md: Markdown) -> None:
+    """Assert pool processes execute code themselves instead of starting their own Python workers.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    markdown = dedent(
+        """
+        ```python exec="1"
+        import os
+        print(f"parent: {os.getppid()}")
+        ```
+
+        ```python exec="1" session="workers"
+        print("in a worker")
+        ```
+        """,
+    )
+    _python_workers.configure(1)
+    try:
+        assert _parallel_executor.submit_page(markdown, ["python"]) == 1
+        html = md.convert(markdown)
+    finally:
+        _python_workers.configure(0)
+    # Executed directly by the pool process, not by a worker it started.
+    assert f"parent: {os.getpid()}" in html
+    assert "in a worker" in html
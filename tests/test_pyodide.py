@@ -0,0 +1,93 @@
+"""Tests for the Pyodide formatter."""
+
+from __future__ import annotations
+
+from textwrap import dedent
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pytest
+    from markdown import Markdown
+
+
+def test_loading_pyodide_lazily(md: Markdown, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Assert editors can load Pyodide lazily, per code block or by default.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        monkeypatch: Pytest fixture to patch objects.
+    """
+    source = dedent(
+        """
+        ```pyodide {options}
+        print("hello")
+        ```
+        """,
+    )
+    eager = md.convert(source.format(options=""))
+    assert 'data-load="eager"' in eager
+    assert "lazy=false" in eager
+
+    lazy = md.convert(source.format(options='load="lazy"'))
+    assert 'data-load="lazy"' in lazy
+    assert "lazy=true" in lazy
+    assert "Python will load when" in lazy
+
+    monkeypatch.setenv("MARKDOWN_EXEC_PYODIDE_LOAD", "lazy")
+    assert "lazy=true" in md.convert(source.format(options=""))
+    assert "lazy=false" in md.convert(source.format(options='load="eager"'))
+
+
+def test_emitting_assets_once_per_page(md: Markdown) -> None:
+    """Assert assets are emitted by the first editor of each page only.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    source = dedent(
+        """
+        ```pyodide assets="no"
+        print("no assets")
+        ```
+
+        ```pyodide
+        print("assets")
+        ```
+
+        ````md exec="1"
+        ```pyodide
+        print("nested")
+        ```
+        ````
+
+        ```pyodide
+        print("assets again?")
+        ```
+        """,
+    )
+    html = md.convert(source)
+    assert html.count("pyodide.js") == 1
+    assert html.index("pyodide.js") > html.index("no assets")
+    assert html.index("pyodide.js") < html.index("nested")
+
+    md.reset()
+    assert md.convert(source).count("pyodide.js") == 1
+
+
+def test_packages_to_install(md: Markdown) -> None:
+    """Assert packages to install are listed in data attributes, for batched installation.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    html = md.convert(
+        dedent(
+            """
+            ```pyodide install="numpy, pandas"
+            import numpy
+            ```
+            """,
+        ),
+    )
+    assert 'data-install="numpy,pandas"' in html
+    assert "install=['numpy', 'pandas']" in html
@@ -2,12 +2,20 @@
 
 from __future__ import annotations
 
+import os
 import re
+import sys
 from textwrap import dedent
 from typing import TYPE_CHECKING
 
+import pytest
+
+from markdown_exec import purge_python_state, python_state
+from markdown_exec._internal.formatters import _output_buffer
+from markdown_exec._internal.formatters._python_workers import _python_workers
+from markdown_exec._internal.formatters.python import _code_blocks, _purge_unused_sessions_code_blocks
+
 if TYPE_CHECKING:
-    import pytest
     from markdown import Markdown
 
 
@@ -229,3 +237,215 @@ def test_future_annotations_do_not_leak_into_user_code(md: Markdown) -> None:
     )
     assert "<code>Int</code>" not in html
     assert re.search(r"class '_code_block_n\d+_\.Int'", html)
+
+
+def test_executing_code_in_worker_processes(md: Markdown) -> None:
+    """Assert Python code can be executed in worker processes, with session affinity.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    # A module that nothing else imports.
+    _python_workers.configure(2, preload=["colorsys"])
+    try:
+        html = md.convert(
+            dedent(
+                """
+                ```python exec="1" session="workers"
+                import os, sys
+                pid = os.getpid()
+                print(f"preloaded: {'colorsys' in sys.modules}")
+                ```
+
+                ```python exec="1" session="workers"
+                print(f"same worker: {os.getpid() == pid}")
+                ```
+
+                ```python exec="1"
+                raise ValueError("oops")
+                ```
+                """,
+            ),
+        )
+    finally:
+        _python_workers.configure(0)
+    assert "preloaded: True" in html
+    assert "colorsys" not in sys.modules
+    assert "same worker: True" in html
+    assert "Traceback" in html
+    assert "oops" in html
+    assert str(os.getpid()) not in html
+
+
+def test_python_worker_dying(md: Markdown) -> None:
+    """Assert a dying Python worker is reported and replaced.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    _python_workers.configure(1)
+    try:
+        html = md.convert(
+            dedent(
+                """
+                ```python exec="1" session="dying"
+                import os
+                os._exit(3)
+                ```
+
+                ```python exec="1" session="dying"
+                print("still alive")
+                ```
+                """,
+            ),
+        )
+    finally:
+        _python_workers.configure(0)
+    assert "Python worker died while executing the code block (exit code 3)." in html
+    assert "still alive" in html
+
+
+@pytest.mark.skipif(os.name != "posix", reason="No time for the annoying OS.")
+def test_timeouts(md: Markdown) -> None:
+    """Assert Python blocks running for too long are stopped, even if they catch exceptions.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    html = md.convert(
+        dedent(
+            """
+            ```python exec="1" timeout="0.5"
+            import time
+            print("started")
+            try:
+                time.sleep(10)
+            except Exception:
+                print("caught")
+            ```
+            """,
+        ),
+    )
+    text = re.sub(r"<[^>]+>", "", html)
+    assert "started" in text
+    assert "caught" not in text
+    assert "Execution timed out after 0.5 seconds." in text
+
+
+@pytest.mark.parametrize(
+    ("truncate", "kept", "dropped"),
+    [
+        ("head", "line 0\n", "line 999\n"),
+        ("tail", "line 999\n", "line 0\n"),
+    ],
+)
+def test_truncating_output(
+    md: Markdown,
+    monkeypatch: pytest.MonkeyPatch,
+    truncate: str,
+    kept: str,
+    dropped: str,
+) -> None:
+    """Assert large outputs are truncated, keeping their head or tail.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        monkeypatch: Pytest fixture to patch objects.
+        truncate: The truncation mode.
+        kept: A line that must be kept.
+        dropped: A line that must be dropped.
+    """
+    monkeypatch.setenv("MARKDOWN_EXEC_OUTPUT_LIMIT", "100")
+    monkeypatch.setenv("MARKDOWN_EXEC_OUTPUT_TRUNCATE", truncate)
+    monkeypatch.setattr(_output_buffer, "_spill_size", 10)
+    html = md.convert(
+        dedent(
+            """
+            ```python exec="1" result="text"
+            for index in range(1000):
+                print("line", index)
+            ```
+            """,
+        ),
+    )
+    assert kept in html
+    assert dropped not in html
+    assert "bytes of output truncated" in html
+
+
+def test_releasing_python_state(md: Markdown) -> None:
+    """Assert state is dropped after non-session blocks, and can be inspected and purged for sessions.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    modules = set(sys.modules)
+    md.convert(
+        dedent(
+            """
+            ```python exec="1"
+            value = 0
+            ```
+
+            ```python exec="1" session="state"
+            value = 1
+            ```
+            """,
+        ),
+    )
+    assert len(set(sys.modules) - modules) == 1
+    assert python_state()["state"] == {"globals": 4, "code_blocks": 1}
+    purge_python_state("state")
+    assert "state" not in python_state()
+    assert set(sys.modules) == modules
+    assert not [code_block_id for code_block_id in _code_blocks if "session state;" in code_block_id]
+
+
+def test_purging_unused_code_blocks(md: Markdown) -> None:
+    """Assert only the session blocks still used by session variables are kept across builds.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    document = dedent(
+        """
+        ```python exec="1" session="rebuilds"
+        def function():
+            return 1
+        ```
+
+        ```python exec="1" session="rebuilds"
+        value = function()
+        ```
+        """,
+    )
+    md.convert(document)
+    md.convert(document)
+    try:
+        assert python_state()["rebuilds"]["code_blocks"] == 4
+        _purge_unused_sessions_code_blocks()
+        assert python_state()["rebuilds"]["code_blocks"] == 1
+        assert md.convert('```python exec="1" session="rebuilds"\nprint(function())\n```') == "<p>1</p>"
+    finally:
+        purge_python_state("rebuilds")
+
+
+def test_computing_sessions_sizes(md: Markdown) -> None:
+    """Assert the approximate size of sessions accounts for their data.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    md.convert(
+        dedent(
+            """
+            ```python exec="1" session="sizes"
+            data = {"key": ["x" * 100_000, "y" * 100_000]}
+            ```
+            """,
+        ),
+    )
+    try:
+        assert 200_000 < python_state(sizes=True)["sizes"]["size"] < 300_000
+    finally:
+        purge_python_state("sizes")
@@ -2,11 +2,20 @@
 
 from __future__ import annotations
 
+import asyncio
+import os
+import re
+import time
 from textwrap import dedent
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+from markdown_exec import async_formatter, validator
 
 if TYPE_CHECKING:
-    import pytest
+    from pathlib import Path
+
     from markdown import Markdown
 
 
@@ -85,3 +94,203 @@ def test_return_code(md: Markdown, caplog: pytest.LogCaptureFixture) -> None:
     )
     assert "Not in the mood" in html
     assert "exited with" not in caplog.text
+
+
+def test_sessions(md: Markdown) -> None:
+    """Assert state is kept between shell blocks of the same session.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    html = md.convert(
+        dedent(
+            """
+            ```bash exec="1" session="shell-state"
+            greet() { echo "hello $1"; }
+            export NAME=world
+            cd /
+            ```
+
+            ```bash exec="1" session="shell-state"
+            greet "$NAME from $PWD"
+            ```
+
+            ```bash exec="1" session="other-shell-state"
+            echo "name: [$NAME]"
+            ```
+            """,
+        ),
+    )
+    assert "hello world from /" in html
+    assert "name: []" in html
+
+
+@pytest.mark.skipif(os.name != "posix", reason="No time for the annoying OS.")
+def test_block_options_in_sessions(md: Markdown, tmp_path: Path) -> None:
+    """Assert the working directory and width of each block apply in sessions.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        tmp_path: A temporary path (fixture).
+    """
+    first = tmp_path / "first"
+    second = tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    html = md.convert(
+        dedent(
+            f"""
+            ```bash exec="1" session="block-options" workdir="{first}" width="51"
+            echo "first: $PWD $COLUMNS"
+            ```
+
+            ```bash exec="1" session="block-options" workdir="{second}" width="52"
+            echo "second: $PWD $COLUMNS"
+            ```
+
+            ```bash exec="1" session="block-options"
+            echo "third: $PWD"
+            ```
+            """,
+        ),
+    )
+    assert f"first: {first} 51" in html
+    assert f"second: {second} 52" in html
+    assert f"third: {second}" not in html
+
+
+def test_newlines_in_sessions(md: Markdown) -> None:
+    """Assert newlines are translated in sessions like in other blocks.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+    template = dedent(
+        """
+        ```sh exec="1" html="1" {session}
+        printf 'crlf\\r\\ncr\\rlf\\n'
+        ```
+        """,
+    )
+    html = md.convert(template.format(session=""))
+    assert "crlf\ncr\nlf" in html
+    md.reset()
+    assert md.convert(template.format(session='session="newlines"')) == html
+
+
+def test_return_code_in_sessions(md: Markdown, caplog: pytest.LogCaptureFixture) -> None:
+    """Assert return codes are checked per block in sessions, and exiting restarts the shell.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        caplog: Pytest fixture to capture logs.
+    """
+    html = md.convert(
+        dedent(
+            """
+            ```sh exec="1" session="shell-codes" returncode="1"
+            VALUE=kept
+            false
+            ```
+
+            ```sh exec="1" session="shell-codes"
+            echo "value: $VALUE"
+            ```
+
+            ```sh exec="1" session="shell-codes" returncode="3"
+            exit 3
+            ```
+
+            ```sh exec="1" session="shell-codes"
+            echo "after exit: [$VALUE]"
+            ```
+            """,
+        ),
+    )
+    assert "value: kept" in html
+    assert "after exit: []" in html
+    assert "exited with" not in caplog.text
+
+
+@pytest.mark.skipif(os.name != "posix", reason="No time for the annoying OS.")
+def test_timeouts(md: Markdown, caplog: pytest.LogCaptureFixture) -> None:
+    """Assert blocks running for too long are stopped, with their partial output.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        caplog: Pytest fixture to capture logs.
+    """
+    html = md.convert(
+        dedent(
+            """
+            ```sh exec="1" timeout="0.5"
+            echo "started"
+            sleep 10
+            echo "finished"
+            ```
+
+            ```sh exec="1" session="shell-timeout" timeout="0.5"
+            echo "started in session"
+            sleep 10
+            ```
+
+            ```sh exec="1" session="shell-timeout"
+            echo "restarted session"
+            ```
+            """,
+        ),
+    )
+    text = re.sub(r"<[^>]+>", "", html)
+    assert "started" in text
+    assert "finished" not in text
+    assert "started in session" in text
+    assert "restarted session" in text
+    assert text.count("Execution timed out after 0.5 seconds.") == 2
+    assert "exited with errors" in caplog.text
+
+
+def test_async_formatter(md: Markdown) -> None:
+    """Assert shell code blocks are executed concurrently with the async formatter.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+
+    async def render(code: str, **inputs: str) -> str:
+        options: dict[str, Any] = {}
+        assert validator("sh", {"exec": "1", **inputs}, options, {}, md)
+        return await async_formatter(code, "sh", "sh", options, md)
+
+    async def render_all() -> list[str]:
+        return await asyncio.gather(
+            *(render(f"sleep 0.5; echo block{index}") for index in range(5)),
+            render("echo failure; exit 2"),
+            render("sleep 5", timeout="0.2"),
+        )
+
+    start = time.perf_counter()
+    *outputs, failure, timeout = asyncio.run(render_all())
+    assert time.perf_counter() - start < 2
+    for index, output in enumerate(outputs):
+        assert f"block{index}" in output
+    assert "failure" in failure
+    assert "Execution timed out after 0.2 seconds." in re.sub(r"<[^>]+>", "", timeout)
+
+
+def test_async_formatter_duplicates(md: Markdown) -> None:
+    """Assert identical blocks rendered concurrently are executed independently.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+    """
+
+    async def render() -> str:
+        options: dict[str, Any] = {}
+        assert validator("sh", {"exec": "1"}, options, {}, md)
+        return await async_formatter("sleep 0.2; echo pid: $$", "sh", "sh", options, md)
+
+    async def render_all() -> list[str]:
+        return await asyncio.gather(render(), render())
+
+    first, second = (re.search(r"pid: \d+", output).group() for output in asyncio.run(render_all()))  # type: ignore[union-attr]
+    assert first != second
@@ -0,0 +1,90 @@
+"""Tests for the execution timings."""
+
+from __future__ import annotations
+
+import json
+from textwrap import dedent
+from typing import TYPE_CHECKING
+
+import pytest
+
+from markdown_exec._internal.timings import _execution_timings
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from markdown import Markdown
+
+
+@pytest.fixture(autouse=True)
+def _enable_timings() -> Iterator[None]:
+    _execution_timings.enabled = True
+    try:
+        yield
+    finally:
+        _execution_timings.enabled = False
+        _execution_timings.reset()
+
+
+def test_timing_executed_code_blocks(md: Markdown, tmp_path: Path) -> None:
+    """Assert executed code blocks are timed and reported, slowest first.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        tmp_path: A temporary directory (fixture).
+    """
+    md.convert(
+        dedent(
+            """
+            ```python exec="1" id="fast"
+            print("fast")
+            ```
+
+            ```sh exec="1" id="slow"
+            sleep 0.2
+            echo slow
+            ```
+
+            ```python exec="1" id="failing"
+            raise ValueError
+            ```
+            """,
+        ),
+    )
+    report = tmp_path / "timings.json"
+    _execution_timings.write_report(report)
+    blocks = json.loads(report.read_text(encoding="utf8"))["blocks"]
+    assert blocks[0]["identifier"] == "slow"
+    assert blocks[0]["wall_time"] >= 0.2
+    assert blocks[0]["output_size"] == len("slow\n")
+    assert [block["error"] for block in blocks if block["identifier"] == "failing"] == [True]
+    assert "slow" in _execution_timings.summary(1)
+    assert "fast" not in _execution_timings.summary(1)
+
+
+def test_cpu_time_of_code_running_elsewhere(md: Markdown, tmp_path: Path) -> None:
+    """Assert CPU time is reported as unavailable for code running in session shells.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        tmp_path: A temporary directory (fixture).
+    """
+    md.convert(
+        dedent(
+            """
+            ```sh exec="1" id="session" session="timings"
+            echo session
+            ```
+
+            ```sh exec="1" id="subprocess"
+            echo subprocess
+            ```
+            """,
+        ),
+    )
+    report = tmp_path / "timings.md"
+    _execution_timings.write_report(report)
+    rows = {line.rsplit("|", 2)[-2].strip(): line for line in report.read_text(encoding="utf8").splitlines()}
+    assert "| n/a |" in rows["sh 'session' (session timings)"]
+    assert "| n/a |" not in rows["sh 'subprocess'"]
@@ -1,8 +1,30 @@
 """Tests for the shell formatters."""
 
+from __future__ import annotations
+
+import sys
 from textwrap import dedent
+from typing import TYPE_CHECKING
+
+import pytest
+
+from markdown_exec._internal.formatters import tree
+from markdown_exec._internal.rendering import MarkdownConverter
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from markdown import Markdown
 
-from markdown import Markdown
+
+@pytest.fixture(autouse=True)
+def _clear_icons_cache() -> Iterator[None]:
+    # Tests read icons from temporary directories, don't leak them to other tests.
+    try:
+        yield
+    finally:
+        tree._icon_to_svg.cache_clear()
 
 
 def test_output_markdown(md: Markdown) -> None:
@@ -23,3 +45,127 @@ def test_output_markdown(md: Markdown) -> None:
         ),
     )
     assert '<span class="hll">' in html
+
+
+def test_loading_icons_lazily(md: Markdown, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Assert icons are read on first use, and custom icons take precedence.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        tmp_path: A temporary directory (fixture).
+        monkeypatch: Pytest fixture to patch objects.
+    """
+    for icon in ("material/file", "simple/python", "simple/rust"):
+        path = tmp_path / f"{icon}.svg"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"<svg>{icon}</svg>", encoding="utf8")
+    monkeypatch.setattr(tree, "_icons_path", tmp_path)
+    monkeypatch.setitem(tree._custom_icons, "*.pyi", ":simple-python:")
+    monkeypatch.setitem(tree._custom_icons, "build.py", ":simple-rust:")
+    tree._icon_to_svg.cache_clear()
+    html = md.convert(
+        dedent(
+            """
+            ```tree
+            src/
+                module.py
+                module.pyi
+                build.py
+                data.bin
+            ```
+            """,
+        ),
+    )
+    assert html.count("<svg>simple/python</svg>") == 2
+    assert html.count("<svg>simple/rust</svg>") == 1
+    assert html.count("<svg>material/file</svg>") == 1
+    assert tree._icon_to_svg.cache_info().currsize == 3
+
+
+def test_sprite_icons(md: Markdown, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Assert icons are defined once as symbols in sprite mode, with reproducible IDs.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        tmp_path: A temporary directory (fixture).
+        monkeypatch: Pytest fixture to patch objects.
+    """
+    for icon in ("material/file", "simple/python"):
+        path = tmp_path / f"{icon}.svg"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 24 24"><path d="{icon}"/></svg>',
+            encoding="utf8",
+        )
+    monkeypatch.setattr(tree, "_icons_path", tmp_path)
+    tree._icon_to_svg.cache_clear()
+    markdown = dedent(
+        """
+        ```tree sprite="yes"
+        src/
+            a.py
+            b.py
+            c.py
+            data.bin
+        ```
+        """,
+    )
+    monkeypatch.setattr(MarkdownConverter, "counter", 0)
+    html = md.convert(markdown)
+    md.reset()
+    MarkdownConverter.counter = 0
+    assert md.convert(markdown) == html
+    assert html.count('<path d="simple/python"/>') == 1
+    assert html.count('<symbol id="markdown-exec-icon-') == 2
+    assert 'viewBox="0 0 24 24"' in html
+    assert html.count('<use href="#markdown-exec-icon-') == 4
+
+
+def test_tree_from_path(md: Markdown, tmp_path: Path) -> None:
+    """Assert trees are built from the file system, and rebuilt when it changes.
+
+    Parameters:
+        md: A Markdown instance (fixture).
+        tmp_path: A temporary path (fixture).
+    """
+    (tmp_path / "pkg" / "sub" / "deep").mkdir(parents=True)
+    (tmp_path / "pkg" / "__pycache__").mkdir()
+    (tmp_path / "pkg" / "__init__.py").touch()
+    (tmp_path / "pkg" / "__init__.pyc").touch()
+    (tmp_path / "pkg" / "sub" / "deep" / "file.txt").touch()
+    (tmp_path / "README.md").touch()
+    source = dedent(
+        f"""
+        ```tree path="{tmp_path}" depth="3" ignore="*.pyc,__pycache__/" icons="none"
+        ```
+        """,
+    )
+    html = md.convert(source)
+    assert "__init__.py" in html
+    assert "deep" in html
+    assert "file.txt" not in html
+    assert "pyc" not in html
+    assert "__pycache__" not in html
+    assert html.index("pkg") < html.index("README.md")
+
+    (tmp_path / "pkg" / "new.py").touch()
+    assert "new.py" in md.convert(source)
+
+    limited = md.convert(source.replace('depth="3"', 'limit="2"'))
+    assert "README.md" not in limited
+    assert "…" in limited
+
+
+def test_deep_and_large_trees() -> None:
+    """Assert trees deeper than the recursion limit, or with many lines, can be formatted."""
+    depth = sys.getrecursionlimit() + 100
+    code = "\n".join(f"{'  ' * level}dir{level}/" for level in range(depth))
+    lines = list(tree._iter_format_tree(tree._build_tree(code), icons="none"))
+    assert len(lines) == depth
+    assert lines[2] == "    └── dir2/"
+
+    code = "\n".join(["root/", *(f"    file{index}" for index in range(100_000))])
+    lines = list(tree._iter_format_tree(tree._build_tree(code), icons="basic"))
+    assert len(lines) == 100_001
+    assert lines[1] == "├── 📄 file0"
+    assert lines[-1] == "└── 📄 file99999"